@@ -0,0 +1,74 @@
+import time
+from collections import deque
+from threading import Lock
+
+# Zentrale Vergabe der Relais: Sicherheitsabschaltung, manuelle Vorgaben und
+# Zeitpläne melden nur Wünsche an; geschaltet wird ausschließlich hier.
+
+PRIORITIES = ("safety", "manual", "schedule")  # höchste Priorität zuerst
+
+
+class ActuatorArbiter:
+    """Besitzt alle Relais und löst konkurrierende Schaltwünsche nach Priorität auf.
+
+    Jede Quelle (siehe PRIORITIES) kann je Komponente True (ein), False (aus)
+    oder None (kein Wunsch) anmelden; es gilt der Wunsch der höchsten Quelle,
+    ohne Wunsch bleibt die Komponente aus. `write(component, on)` wird nur
+    aufgerufen, wenn sich der aufgelöste Zustand ändert; jeder Wechsel wird mit
+    Zeitstempel und auslösender Quelle protokolliert.
+    """
+
+    def __init__(self, components, write, priorities=PRIORITIES, history=1000, clock=time.time):
+        self.priorities = tuple(priorities)
+        self.write = write
+        self.clock = clock
+        # None = unbekannt (z. B. nach dem Start), der erste Beschluss wird immer geschrieben
+        self.state = {component: None for component in components}
+        self._requests = {component: {} for component in components}
+        self._transitions = deque(maxlen=history)
+        self._listeners = []
+        self._lock = Lock()
+
+    def add_listener(self, callback):
+        """`callback(component, on, source)` nach jedem Schaltvorgang."""
+        self._listeners.append(callback)
+
+    def resolve(self, component):
+        """Aufgelöster Zustand und entscheidende Quelle (None = Standard "aus")."""
+        requests = self._requests[component]
+        for source in self.priorities:
+            if requests.get(source) is not None:
+                return requests[source], source
+        return False, None
+
+    def request(self, component, **sources):
+        """Setzt die Wünsche mehrerer Quellen auf einmal und schaltet höchstens einmal.
+
+        Beispiel: request("pump", safety=None, manual=None, schedule=True)
+        """
+        with self._lock:
+            requests = self._requests[component]
+            for source, on in sources.items():
+                if source not in self.priorities:
+                    raise ValueError(f"Unbekannte Quelle: {source}")
+                requests[source] = None if on is None else bool(on)
+            on, source = self.resolve(component)
+            if self.state[component] == on:
+                return on
+            self.write(component, on)
+            self.state[component] = on
+            self._transitions.append(
+                {"timestamp": self.clock(), "component": component, "on": on, "source": source}
+            )
+        for callback in self._listeners:
+            callback(component, on, source)
+        return on
+
+    def requests(self):
+        with self._lock:
+            return {component: dict(requests) for component, requests in self._requests.items()}
+
+    def transitions(self, since=None):
+        """Protokollierte Schaltvorgänge, ältester zuerst, optional ab Zeitpunkt `since`."""
+        with self._lock:
+            return [entry for entry in self._transitions if since is None or entry["timestamp"] >= since]
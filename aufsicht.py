@@ -0,0 +1,192 @@
+import time
+from threading import Lock, Thread
+import metriken
+from protokoll import log
+
+# Überwachung der Regelschleifen: jede Aufgabe des Schedulers (und jeder
+# Dauer-Thread) hat eine erwartete Periode und eine Frist. Erfasst werden
+# Verspätung, Laufzeit, Fristüberschreitungen und Fehler; abgestürzte Aufgaben
+# werden mit wachsender Pause neu gestartet. Eine Aufgabe, deren letzter Lauf
+# länger als `stall_factor` Perioden zurückliegt, gilt als ausgefallen.
+
+OK, FAILED, STALLED, WAITING = "ok", "fehler", "ausgefallen", "wartet"
+
+
+class TaskStats:
+    __slots__ = (
+        "name", "period", "deadline", "restart", "runs", "failures", "consecutive_failures", "overruns",
+        "restarts", "last_start", "last_end", "last_duration", "last_lag", "max_lag", "jitter",
+        "last_error", "next_restart", "running",
+    )
+
+    def __init__(self, name, period=None, deadline=None, restart=None):
+        self.name = name
+        self.period = period
+        self.deadline = deadline
+        self.restart = restart
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.overruns = 0
+        self.restarts = 0
+        self.last_start = None  # Uhrzeit (clock.time())
+        self.last_end = None  # clock.monotonic(), Grundlage des Herzschlags
+        self.last_duration = None
+        self.last_lag = None
+        self.max_lag = 0.0
+        self.jitter = 0.0  # gleitender Mittelwert der Verspätung
+        self.last_error = None
+        self.next_restart = None
+        self.running = False
+
+
+class Supervisor:
+    """Führt Aufgaben mit Buchführung über Termine, Fristen und Fehler aus.
+
+    `declare` legt Periode (erwarteter Höchstabstand zweier Läufe), Frist
+    (spätestes Ende nach dem geplanten Start) und optional eine Neustartfunktion
+    fest. Aufgaben, die sich selbst neu einplanen (z. B. die Planer), brechen
+    bei einer Exception ihre Kette ab; sie werden nach `min_backoff`,
+    `2 * min_backoff`, ... bis `max_backoff` Sekunden mit denselben Argumenten
+    neu gestartet. Zeiten sind `clock.monotonic()`-Werte, Dauern echte Sekunden.
+    """
+
+    def __init__(self, clock, min_backoff=1.0, max_backoff=300.0, stall_factor=3.0, smoothing=0.1):
+        self.clock = clock
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stall_factor = stall_factor
+        self.smoothing = smoothing
+        self.tasks = {}
+        self._threads = {}
+        self._lock = Lock()
+
+    def declare(self, name, period=None, deadline=None, restart=None):
+        self.tasks[name] = TaskStats(name, period, deadline, restart)
+
+    def _stats(self, name):
+        stats = self.tasks.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.tasks.setdefault(name, TaskStats(name))
+        return stats
+
+    def _backoff(self, stats):
+        return min(self.min_backoff * 2 ** (stats.consecutive_failures - 1), self.max_backoff)
+
+    def begin(self, name, when):
+        """Beginn eines Laufs, der zum Zeitpunkt `when` geplant war; liefert das Argument für `end`."""
+        stats = self._stats(name)
+        lag = max(0.0, self.clock.real_seconds(self.clock.monotonic() - when))
+        stats.last_lag = lag
+        stats.max_lag = max(stats.max_lag, lag)
+        stats.jitter += self.smoothing * (lag - stats.jitter)
+        stats.last_start = self.clock.time()
+        stats.running = True
+        metriken.loop_lag_seconds(name).observe(lag)
+        return stats, lag, time.perf_counter()
+
+    def end(self, run, error=None):
+        """Ende eines Laufs; liefert bei einem Fehler die Pause bis zum Neustart, sonst None."""
+        stats, lag, start = run
+        duration = time.perf_counter() - start
+        stats.runs += 1
+        stats.running = False
+        stats.last_duration = duration
+        stats.last_end = self.clock.monotonic()
+        metriken.loop_seconds(stats.name).observe(duration)
+        if stats.deadline is not None and lag + duration > stats.deadline:
+            stats.overruns += 1
+            metriken.loop_overruns(stats.name).inc()
+            log.warning("Frist überschritten", task=stats.name, ms=round(1000 * (lag + duration), 1),
+                        deadline_ms=round(1000 * stats.deadline))
+        if error is None:
+            stats.consecutive_failures = 0
+            stats.next_restart = None
+            return None
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        stats.last_error = f"{type(error).__name__}: {error}"
+        metriken.loop_errors(stats.name).inc()
+        log.error("Aufgabe fehlgeschlagen", task=stats.name, error=stats.last_error)
+        return self._backoff(stats)
+
+    def execute(self, callback, args, when, call_later):
+        """Führt ein Scheduler-Ereignis aus; nach einem Absturz wird über `call_later` neu gestartet."""
+        name = getattr(callback, "__name__", "callback")
+        run = self.begin(name, when)
+        try:
+            callback(*args)
+        except Exception as ex:
+            backoff = self.end(run, ex)
+            stats = run[0]
+            if stats.restart is not None:
+                stats.restarts += 1
+                stats.next_restart = self.clock.time() + backoff
+                metriken.loop_restarts(name).inc()
+                call_later(backoff, stats.restart, *args)
+            return
+        self.end(run)
+
+    def thread(self, name, target, *args):
+        """Startet `target(*args)` als Dauer-Thread, der nach Ende oder Absturz neu gestartet wird."""
+        def supervise():
+            while True:
+                run = self.begin(name, self.clock.monotonic())
+                try:
+                    target(*args)
+                    error = RuntimeError("Thread beendet")
+                except Exception as ex:
+                    error = ex
+                stats = run[0]
+                if time.perf_counter() - run[2] > self.max_backoff:
+                    # Lange fehlerfrei gelaufen: Pause beginnt wieder bei min_backoff
+                    stats.consecutive_failures = 0
+                backoff = self.end(run, error)
+                stats.restarts += 1
+                stats.next_restart = self.clock.time() + backoff
+                metriken.loop_restarts(name).inc()
+                time.sleep(self.clock.real_seconds(backoff))
+
+        self.declare(name)
+        thread = Thread(target=supervise, name=name, daemon=True)
+        self._threads[name] = thread
+        thread.start()
+        return thread
+
+    def _state(self, stats, now):
+        if stats.name in self._threads:
+            # Dauer-Threads haben keinen Herzschlag; maßgeblich ist, ob sie gerade laufen
+            return OK if stats.running else FAILED
+        if stats.consecutive_failures:
+            return FAILED
+        if stats.last_end is None:
+            return WAITING
+        if stats.period is not None and now - stats.last_end > self.stall_factor * stats.period:
+            return STALLED
+        return OK
+
+    def status(self):
+        """Zustand, Herzschlag und Zeitverhalten je Aufgabe."""
+        now = self.clock.monotonic()
+        result = {}
+        for name, stats in list(self.tasks.items()):
+            result[name] = {
+                "state": self._state(stats, now),
+                "running": stats.running,
+                "period": stats.period,
+                "deadline": stats.deadline,
+                "runs": stats.runs,
+                "failures": stats.failures,
+                "overruns": stats.overruns,
+                "restarts": stats.restarts,
+                "heartbeat_age": None if stats.last_end is None else now - stats.last_end,
+                "last_start": stats.last_start,
+                "last_duration": stats.last_duration,
+                "last_lag": stats.last_lag,
+                "max_lag": stats.max_lag,
+                "jitter": stats.jitter,
+                "last_error": stats.last_error,
+                "next_restart": stats.next_restart,
+            }
+        return result
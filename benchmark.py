@@ -0,0 +1,347 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from threading import Condition, Thread
+import numpy as np
+import requests
+
+# Reproduzierbare Messungen der Box-Steuerung gegen die simulierte Hardware
+# (hardware.SimulatedBoard): Latenz vom Befehl bzw. Messwert bis zur
+# Relaisflanke, Durchsatz der API bei N gleichzeitigen Clients sowie CPU-Zeit,
+# Verzögerung und Speicher je Scheduler-Aufgabe. Ergebnisse werden als JSON
+# geschrieben und lassen sich mit --baseline gegen einen früheren Lauf vergleichen.
+#
+#   python benchmark.py --out bench.json
+#   python benchmark.py --out neu.json --baseline bench.json
+
+# Vor dem Import von projekt setzen: simulierte Box in Echtzeit, nichts auf Platte, kein Upload
+BENCH_ENV = {"BOARD": "sim", "SIM_SPEED": "1", "SENSOR_DB": ":memory:"}
+API_ENDPOINTS = ("/get_sensordata", "/get_schedule", "/get_update_status")
+PERCENTILES = (50, 90, 99)
+
+
+def summarize(values, scale=1000.0):
+    """Anzahl, Mittelwert, Perzentile und Maximum; Sekunden werden standardmäßig in ms umgerechnet."""
+    if not len(values):
+        return {"count": 0}
+    data = np.asarray(values, dtype=float) * scale
+    result = {"count": int(data.size), "mean": float(data.mean())}
+    result.update({f"p{p}": float(np.percentile(data, p)) for p in PERCENTILES})
+    result["max"] = float(data.max())
+    return result
+
+
+class EdgeRecorder:
+    """Hängt sich vor `board.output` und merkt sich Zeitpunkt und Pegel der letzten Flanke je Pin."""
+
+    def __init__(self, board):
+        self._output = board.output
+        self._edges = {}
+        self._cond = Condition()
+        board.output = self.output
+
+    def output(self, pin, high):
+        self._output(pin, high)
+        with self._cond:
+            self._edges[pin] = (time.perf_counter(), high)
+            self._cond.notify_all()
+
+    def wait(self, pin, high, since, timeout=10.0):
+        """perf_counter-Zeitpunkt der ersten passenden Flanke nach `since`, None bei Zeitüberschreitung."""
+        def reached():
+            edge = self._edges.get(pin)
+            return edge is not None and edge[0] >= since and edge[1] == high
+        with self._cond:
+            if not self._cond.wait_for(reached, timeout):
+                return None
+            return self._edges[pin][0]
+
+
+def make_profiling_scheduler(projekt):
+    class ProfilingScheduler(projekt.Scheduler):
+        """projekt.Scheduler, der je Aufgabe Verzögerung, Laufzeit, CPU-Zeit und Speicherspitze erfasst."""
+
+        def __init__(self):
+            super().__init__()
+            self.samples = defaultdict(list)
+
+        def reset(self):
+            self.samples = defaultdict(list)
+
+        def run(self):
+            clock = projekt.clock
+            while True:
+                event = self._next_event()
+                name = getattr(event.callback, "__name__", "callback")
+                lag = clock.real_seconds(clock.monotonic() - event.when)
+                tracing = tracemalloc.is_tracing()
+                if tracing:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                wall, cpu = time.perf_counter(), time.thread_time()
+                try:
+                    event.callback(*event.args)
+                except Exception as ex:
+                    projekt.log.error("Aufgabe fehlgeschlagen", task=name, error=str(ex))
+                wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+                peak = tracemalloc.get_traced_memory()[1] - before if tracing else None
+                self.samples[name].append((lag, wall, cpu, peak))
+
+        def report(self, seconds):
+            result = {}
+            for name, samples in sorted(self.samples.items()):
+                lag, wall, cpu, peak = zip(*samples)
+                result[name] = {
+                    "calls_per_second": len(samples) / seconds,
+                    "lag_ms": summarize(lag),
+                    "wall_ms": summarize(wall),
+                    "cpu_ms": summarize(cpu),
+                    "cpu_share": sum(cpu) / seconds,
+                }
+                if peak[0] is not None:
+                    result[name]["peak_kib"] = summarize(peak, scale=1 / 1024)
+            return result
+
+    return ProfilingScheduler()
+
+
+def process_usage():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    result = {"cpu_seconds": usage.ru_utime + usage.ru_stime, "max_rss_kib": usage.ru_maxrss}
+    try:
+        with open("/proc/self/statm") as file:
+            result["rss_kib"] = int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        pass
+    return result
+
+
+def api_client(url, seconds):
+    """Läuft in einem eigenen Prozess, damit die Clients nicht um den GIL der Box konkurrieren.
+
+    Die Messdauer beginnt erst im bereiten Prozess, nicht beim Verteilen der Aufgaben.
+    """
+    session = requests.Session()
+    latencies, errors = [], 0
+    begin = time.perf_counter()
+    deadline = begin + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=10).status_code < 500
+        except requests.RequestException:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    return latencies, errors, time.perf_counter() - begin
+
+
+def bench_api(pool, base_url, endpoint, clients, seconds):
+    usage = process_usage()
+    results = pool.starmap(api_client, [(base_url + endpoint, seconds)] * clients, chunksize=1)
+    latencies = [value for values, _, _ in results for value in values]
+    cpu = process_usage()["cpu_seconds"] - usage["cpu_seconds"]
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors, _ in results),
+        "requests_per_second": sum(len(values) / elapsed for values, _, elapsed in results),
+        "latency_ms": summarize(latencies),
+        # CPU-Zeit des ganzen Box-Prozesses, also einschließlich der Regelschleifen
+        "server_cpu_ms_per_request": 1000 * cpu / max(1, len(latencies)),
+    }
+
+
+def bench_command(session, base_url, recorder, pin, active_low, component, trials):
+    """POST /set_update_status mit manueller Vorgabe ein/aus bis zur Relaisflanke."""
+    response_times, actuation = [], []
+    # Ausgangslage: manuell aus, unabhängig vom Zeitplan
+    session.post(base_url + "/set_update_status", json={"status": {component: None}})
+    recorder.wait(pin, active_low, 0.0)
+    for i in range(trials):
+        on = i % 2 == 0
+        start = time.perf_counter()
+        session.post(base_url + "/set_update_status", json={"status": {component: True if on else None}})
+        response_times.append(time.perf_counter() - start)
+        edge = recorder.wait(pin, on != active_low, start)
+        if edge is not None:
+            actuation.append(edge - start)
+    session.post(base_url + "/set_update_status", json={"status": {component: False}})
+    return {"component": component, "trials": trials,
+            "http_response_ms": summarize(response_times), "actuation_ms": summarize(actuation)}
+
+
+def bench_interlock(projekt, recorder, pump, trials, sample_directly):
+    """Wassermangel bis zur Abschaltung der Pumpe über die Sperre.
+
+    Mit `sample_directly` wird sofort ein Messrahmen angefordert (reine
+    Verarbeitungszeit); sonst muss die adaptive Abtastung den Wert selbst finden.
+    """
+    actuator = projekt.registry.actuators[pump]
+    board = projekt.board
+    projekt.state.update(status={pump: True})
+    recorder.wait(actuator.pin, not actuator.active_low, 0.0)
+    sensors = tuple(lock.sensor for lock in actuator.interlocks)
+    latencies = []
+    # Zufälliger Versatz zur Abtastung, sonst fiele jede Messung auf die Abtastung nach dem Wiedereinschalten
+    period = projekt.clock.real_seconds(max(projekt.registry.sensors[name].min_period for name in sensors))
+    for _ in range(trials):
+        if not sample_directly:
+            time.sleep(random.uniform(period, 2 * period))
+        tank = board.tank
+        start = time.perf_counter()
+        board.tank = 0.0
+        if sample_directly:
+            projekt.sampler.sample(sensors)
+        edge = recorder.wait(actuator.pin, actuator.active_low, start)
+        if edge is not None:
+            latencies.append(edge - start)
+        board.tank = tank
+        projekt.sampler.sample(sensors)
+        restart = time.perf_counter()
+        projekt.arbiter.request(pump, safety=None)
+        recorder.wait(actuator.pin, not actuator.active_low, restart)
+    projekt.state.update(status={pump: False})
+    return {"component": pump, "trials": trials, "latency_ms": summarize(latencies)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ.pop("UPLOAD_URL", None)
+    archive = tempfile.TemporaryDirectory()
+    os.environ.setdefault("SENSOR_ARCHIVE", os.path.join(archive.name, "sensorarchiv.zra"))
+
+    import logging
+    from werkzeug.serving import make_server
+    import projekt
+
+    # Zugriffsprotokoll des Entwicklungsservers würde die Durchsatzmessung dominieren
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    scheduler = projekt.scheduler = make_profiling_scheduler(projekt)
+    recorder = EdgeRecorder(projekt.board)
+    server = make_server("127.0.0.1", 0, projekt.app, threaded=True)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    Thread(target=server.serve_forever, daemon=True).start()
+    Thread(target=scheduler.run, daemon=True).start()
+    projekt.start_jobs()
+    time.sleep(args.warmup)
+
+    result = {
+        "meta": {
+            "timestamp": time.time(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "board": projekt.BOARD,
+            "sim_speed": projekt.clock.speed,
+            "args": vars(args),
+        },
+    }
+
+    scheduler.reset()
+    time.sleep(args.seconds)
+    result["loops_idle"] = scheduler.report(args.seconds)
+
+    pool = multiprocessing.get_context("spawn").Pool(args.clients)
+    # Mit spawn importiert jeder Prozess erst beim ersten Auftrag; das soll nicht in die Messung fallen
+    pool.map(int, range(args.clients), chunksize=1)
+    result["api"] = {}
+    scheduler.reset()
+    for endpoint in API_ENDPOINTS:
+        result["api"][endpoint] = bench_api(pool, base_url, endpoint, args.clients, args.seconds)
+    result["loops_under_load"] = scheduler.report(args.seconds * len(API_ENDPOINTS))
+    pool.close()
+
+    tracemalloc.start()
+    scheduler.reset()
+    time.sleep(args.seconds)
+    result["loops_memory"] = {
+        name: stats.get("peak_kib") for name, stats in scheduler.report(args.seconds).items()
+    }
+    tracemalloc.stop()
+
+    session = requests.Session()
+    schedule_actuator = next(
+        (a for a in projekt.registry.actuators.values() if a.controller == "schedule"), None
+    )
+    if schedule_actuator is not None:
+        result["command_to_actuation"] = bench_command(
+            session, base_url, recorder, schedule_actuator.pin, schedule_actuator.active_low,
+            schedule_actuator.name, args.trials,
+        )
+    pump = next((a.name for a in projekt.registry.actuators.values()
+                 if a.controller == "irrigation" and a.interlocks), None)
+    if pump is not None and projekt.BOARD == "sim":
+        result["sensor_to_decision"] = bench_interlock(projekt, recorder, pump, args.trials, True)
+        result["sensor_to_actuation"] = bench_interlock(projekt, recorder, pump, args.loop_trials, False)
+
+    result["process"] = process_usage()
+    server.shutdown()
+    archive.cleanup()
+    return result
+
+
+def compare(result, baseline, path=""):
+    """Flache Liste (Pfad, alt, neu, Änderung) für Perzentile und Durchsatz."""
+    rows = []
+    for key, value in result.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            rows += compare(value, old or {}, f"{path}{key}.")
+        elif key in ("p50", "p99", "requests_per_second") and isinstance(old, (int, float)) and old:
+            rows.append((path + key, old, value, value / old - 1))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark der Box-Steuerung gegen die simulierte Hardware")
+    parser.add_argument("--out", default="benchmark.json", help="Ergebnisdatei (JSON), '-' für stdout")
+    parser.add_argument("--baseline", help="früheres Ergebnis zum Vergleich")
+    parser.add_argument("--clients", type=int, default=8, help="gleichzeitige API-Clients")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Dauer je Messphase")
+    parser.add_argument("--trials", type=int, default=50, help="Wiederholungen der Latenzmessungen")
+    parser.add_argument("--loop-trials", type=int, default=10,
+                        help="Wiederholungen über die adaptive Abtastung (je bis zu einer Abtastperiode)")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as file:
+            file.write(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        for name, old, new, change in compare(result, baseline):
+            print(f"{name:70s} {old:12.3f} {new:12.3f} {change:+8.1%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from collections import deque
+import time
+
+# Geregelte Bewässerung: statt eines festen Pumpenlaufs wird in kurzen Pulsen
+# dosiert. Nach jedem Puls wird eine Sickerzeit abgewartet und gemessen, wie
+# stark die Bodenfeuchte gestiegen ist; daraus wird die Wirkung je
+# Pumpensekunde geschätzt und der nächste Puls bemessen.
+
+IDLE, DOSING, SOAKING = "bereit", "dosieren", "einsickern"
+
+
+class PulseIrrigation:
+    """Zweipunktregelung mit Band [low, high] und proportional bemessenen Pulsen.
+
+    Ein Zyklus beginnt, sobald die Bodenfeuchte unter `low` fällt, und endet,
+    wenn sie nach einer Sickerzeit die Bandmitte erreicht hat, `max_cycle_seconds`
+    Pumpzeit verbraucht sind oder die Bewässerung nicht mehr erlaubt ist
+    (Zeitfenster, manuelle Vorgabe, Wassermangel). Die Pulslänge ist
+    (Sollwert - Istwert) / rate, begrenzt auf [min_pulse, max_pulse]; `rate`
+    (Prozentpunkte je Pumpensekunde) wird aus den gemessenen Antworten geglättet
+    nachgeführt. Zeiten sind `time.monotonic()`-Werte; `clock` liefert die Uhrzeit
+    für Beginn und Ende eines Zyklus.
+    """
+
+    def __init__(self, low=42.0, high=50.0, min_pulse=5.0, max_pulse=60.0, soak=120.0,
+                 rate=0.05, smoothing=0.5, max_cycle_seconds=270.0, flow_lpm=1.5, history=50,
+                 clock=time.time):
+        self.low = low
+        self.high = high
+        self.min_pulse = min_pulse
+        self.max_pulse = max_pulse
+        self.soak = soak
+        self.rate = rate
+        self.smoothing = smoothing
+        self.max_cycle_seconds = max_cycle_seconds
+        self.flow_lpm = flow_lpm
+        self.clock = clock
+        self.phase = IDLE
+        self.cycle = None  # laufender Zyklus, siehe _start
+        self.cycles = deque(maxlen=history)
+        self._phase_end = None
+        self._pulse = 0.0
+        self._before = None
+
+    @property
+    def setpoint(self):
+        return (self.low + self.high) / 2
+
+    def due(self, now):
+        """True, wenn eine Puls- oder Sickerphase abgelaufen ist und ein frischer Messwert gebraucht wird."""
+        return self._phase_end is not None and now >= self._phase_end
+
+    def step(self, now, moisture, allowed=True):
+        """Nächste Entscheidung: (Pumpe an?, Sekunden bis zur nächsten Entscheidung oder None)."""
+        if not allowed:
+            if self.cycle is not None:
+                self._finish(now, moisture, "abgebrochen")
+            return False, None
+        if self.phase == IDLE:
+            if moisture >= self.low:
+                return False, None
+            self._start(moisture)
+            return self._dose(now, moisture)
+        if now < self._phase_end:
+            return self.phase == DOSING, self._phase_end - now
+        if self.phase == DOSING:
+            self.cycle["pump_seconds"] += self._pulse
+            self.phase = SOAKING
+            self._phase_end = now + self.soak
+            return False, self.soak
+        # Sickerzeit vorbei: Antwort des Bodens auswerten
+        response = (moisture - self._before) / self._pulse
+        if response > 0:
+            self.rate = (1 - self.smoothing) * self.rate + self.smoothing * response
+        if moisture >= self.setpoint:
+            self._finish(now, moisture, "erreicht")
+            return False, None
+        if self.cycle["pump_seconds"] >= self.max_cycle_seconds:
+            self._finish(now, moisture, "pumpzeit_erschoepft")
+            return False, None
+        return self._dose(now, moisture)
+
+    def _start(self, moisture):
+        self.cycle = {
+            "start": self.clock(), "end": None, "pulses": 0, "pump_seconds": 0.0,
+            "water_liters": 0.0, "moisture_start": moisture, "moisture_end": None, "result": None,
+        }
+
+    def _dose(self, now, moisture):
+        pulse = (self.setpoint - moisture) / self.rate if self.rate > 0 else self.max_pulse
+        pulse = min(max(pulse, self.min_pulse), self.max_pulse,
+                    self.max_cycle_seconds - self.cycle["pump_seconds"])
+        self._pulse = pulse
+        self._before = moisture
+        self.cycle["pulses"] += 1
+        self.phase = DOSING
+        self._phase_end = now + pulse
+        return True, pulse
+
+    def _finish(self, now, moisture, result):
+        cycle = self.cycle
+        if self.phase == DOSING:
+            # Abbruch mitten im Puls: nur die tatsächlich gelaufene Zeit zählt
+            cycle["pump_seconds"] += max(0.0, self._pulse - (self._phase_end - now))
+        cycle["end"] = self.clock()
+        cycle["water_liters"] = cycle["pump_seconds"] * self.flow_lpm / 60
+        cycle["moisture_end"] = moisture
+        cycle["result"] = result
+        self.cycles.append(cycle)
+        self.cycle = None
+        self.phase = IDLE
+        self._phase_end = None
+
+    def snapshot(self):
+        return {
+            "phase": self.phase,
+            "rate": self.rate,
+            "band": [self.low, self.high],
+            "cycle": dict(self.cycle) if self.cycle is not None else None,
+            "cycles": list(self.cycles),
+        }
@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import random
+import datetime
+from schnittstelle import get_json
 
 # Debugging-Ausgabe hinzufügen
 print("Diagramm-Modul wird geladen.")  # Dies wird in der Konsole ausgegeben
@@ -25,15 +27,25 @@ def generate_water_level_over_day():
     water_levels_percentage = [(level / max_volume_liters) * 100 for level in water_levels]
     return hours, water_levels_percentage
 
-# Testdaten für den Stromverbrauch
+# Stromverbrauch aus den Energiezählern der Box (0, wenn die Box nicht erreichbar ist)
 def generate_power_consumption_data():
-    current_consumption = random.uniform(0.5, 3.0)  # Aktueller Stromverbrauch in kWh
-    return current_consumption
+    today = datetime.date.today().isoformat()
+    data = get_json("/get_energy", period="day", start=today, end=today)
+    if not data:
+        return 0.0
+    wh = sum(bucket["wh"] for buckets in data["buckets"].values() for bucket in buckets)
+    return wh / 1000  # Heutiger Stromverbrauch in kWh
 
 def generate_power_consumption_over_day():
     hours = np.arange(0, 24)  # Stunden des Tages
-    power_consumption = [random.uniform(0.5, 3.0) for _ in range(24)]  # Zufälliger Stromverbrauch in kWh pro Stunde
-    return hours, power_consumption
+    power_consumption = np.zeros(24)
+    today = datetime.date.today().isoformat()
+    data = get_json("/get_energy", period="hour", start=f"{today} 00", end=f"{today} 23")
+    if data:
+        for buckets in data["buckets"].values():
+            for bucket in buckets:
+                power_consumption[int(bucket["bucket"][-2:])] += bucket["wh"] / 1000  # kWh pro Stunde
+    return hours, list(power_consumption)
 
 # Diagramm für den aktuellen Wasserstand als vertikales Balkendiagramm
 def plot_current_water_level(parameter='percentage'):
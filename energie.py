@@ -0,0 +1,93 @@
+from threading import Lock
+import numpy as np
+
+# Energiezählung: die Leistung wird trapezförmig über die Zeit integriert und
+# anhand der Relaiszustände auf die Komponenten verteilt.
+
+IDLE = "grundlast"  # Verbrauch, während kein Relais geschaltet ist
+
+
+class EnergyIntegrator:
+    """Integriert Leistungsmesswerte zu kumulierten Wh-Zählern je Komponente.
+
+    Zwischen zwei Messwerten wird die Energie als Trapez (mittlere Leistung mal
+    Zeitabstand) gerechnet. Liegen mehr als `max_gap` Sekunden zwischen zwei
+    Werten, wird die Lücke nicht überbrückt, sondern nur in `gap_seconds`
+    mitgezählt. Die Energie eines Intervalls wird den Komponenten zugeordnet,
+    deren Relais zu Beginn des Intervalls eingeschaltet war, gewichtet mit ihrer
+    Nennleistung.
+    """
+
+    def __init__(self, nominal_watts, max_gap=5.0, sink=None):
+        self.nominal_watts = nominal_watts
+        self.max_gap = max_gap
+        self.sink = sink  # sink(timestamp, component, wh), z. B. SensorStore.add_energy
+        self.totals = {component: 0.0 for component in list(nominal_watts) + [IDLE]}
+        self.gap_seconds = 0.0
+        self._last = None
+        self._lock = Lock()
+
+    def add_sample(self, timestamp, watts, active):
+        """Nimmt einen Leistungswert (W) und die Menge der eingeschalteten Komponenten auf."""
+        watts = max(watts, 0.0)
+        with self._lock:
+            last, self._last = self._last, (timestamp, watts, frozenset(active))
+            if last is None:
+                return
+            last_timestamp, last_watts, last_active = last
+            dt = timestamp - last_timestamp
+            if dt <= 0:
+                return
+            if dt > self.max_gap:
+                self.gap_seconds += dt
+                return
+            shares = self._attribute((last_watts + watts) / 2 * dt / 3600, last_active)
+            for component, wh in shares.items():
+                self.totals[component] = self.totals.get(component, 0.0) + wh
+        if self.sink is not None:
+            for component, wh in shares.items():
+                self.sink(timestamp, component, wh)
+
+    def _attribute(self, wh, active):
+        weights = {component: self.nominal_watts.get(component, 1.0) for component in active}
+        total = sum(weights.values())
+        if not total:
+            return {IDLE: wh}
+        return {component: wh * weight / total for component, weight in weights.items()}
+
+    def snapshot(self):
+        with self._lock:
+            return {"totals_wh": dict(self.totals), "gap_seconds": self.gap_seconds}
+
+
+def analyze_waveform(raw, duration, sensitivity, mains_voltage, power_factor=1.0,
+                     mains_frequency=50.0, vref=5.0, noise_rms=0.0):
+    """Wertet eine Stromkurve des ACS712 vektorisiert aus.
+
+    `raw` sind ADC-Werte (0-1023), aufgenommen in `duration` Sekunden. Der
+    Nullpunkt wird als Mittelwert über ganze Netzperioden bestimmt und abgezogen;
+    daraus folgen Effektivstrom, Spitzenstrom und die geschätzte Wirkleistung.
+    `noise_rms` ist der ohne Last gemessene Effektivstrom (A) aus Sensor- und
+    Wandlerrauschen; er ist unkorreliert mit dem Laststrom und wird
+    quadratisch abgezogen.
+    """
+    samples = np.asarray(raw, dtype=np.float64)
+    sample_rate = len(samples) / duration if duration > 0 else 0.0
+    if sample_rate:
+        # Auf ganze Perioden kürzen, sonst verschiebt eine angeschnittene Halbwelle den Nullpunkt
+        per_cycle = sample_rate / mains_frequency
+        cycles = int(len(samples) / per_cycle)
+        if cycles:
+            samples = samples[:int(round(cycles * per_cycle))]
+    volts = samples * (vref / 1023.0)
+    offset = volts.mean()
+    current = (volts - offset) / sensitivity
+    rms_current = float(np.sqrt(max(0.0, np.mean(current * current) - noise_rms * noise_rms)))
+    return {
+        "rms_current": rms_current,
+        "peak_current": float(np.abs(current).max()),
+        "offset_voltage": float(offset),
+        "real_power": mains_voltage * rms_current * power_factor,
+        "sample_rate": sample_rate,
+        "samples": len(samples),
+    }
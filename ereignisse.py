@@ -0,0 +1,92 @@
+from collections import deque
+from threading import Condition
+import orjson
+
+# Verteilung von Live-Daten (Messrahmen, Zustandsänderungen) als Server-Sent Events.
+
+_MISSING = object()
+
+
+class EventHub:
+    """Verteilt Änderungen als kompakte Deltas an beliebig viele Abonnenten.
+
+    Jedes Ereignis wird genau einmal kodiert und mit fortlaufender Nummer in
+    einem begrenzten Puffer abgelegt. Abonnenten merken sich nur die Nummer des
+    zuletzt gelesenen Ereignisses und warten gemeinsam auf eine Condition; es
+    gibt keine Warteschlange und keine Kodierung pro Client. Wer so weit
+    zurückliegt, dass Ereignisse aus dem Puffer gefallen sind, erhält erneut
+    einen vollständigen Snapshot.
+    """
+
+    def __init__(self, capacity=256):
+        self._events = deque(maxlen=capacity)  # (Nummer, kodiertes Ereignis)
+        self._seq = 0
+        self._view = {}  # aktueller Gesamtstand je Art, Basis für Deltas und Snapshots
+        self._cond = Condition()
+        self._waiters = []
+
+    @staticmethod
+    def encode(seq, kind, data):
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (seq, kind.encode(), orjson.dumps(data))
+
+    def add_waiter(self, callback):
+        """Registriert `callback()`, das nach jedem neuen Ereignis aufgerufen wird (z. B. für asyncio)."""
+        self._waiters.append(callback)
+
+    def update(self, kind, values):
+        """Übernimmt neue Werte einer Art und veröffentlicht nur die geänderten Schlüssel."""
+        with self._cond:
+            current = self._view.setdefault(kind, {})
+            delta = {key: value for key, value in values.items() if current.get(key, _MISSING) != value}
+            if not delta:
+                return None
+            current.update(delta)
+            self._seq += 1
+            self._events.append((self._seq, self.encode(self._seq, kind, delta)))
+            self._cond.notify_all()
+        for callback in self._waiters:
+            callback()
+        return delta
+
+    def snapshot(self):
+        with self._cond:
+            return self._seq, {kind: dict(values) for kind, values in self._view.items()}
+
+    def events_since(self, seq):
+        """Kodierte Ereignisse nach `seq`; None, wenn der Puffer nicht mehr so weit zurückreicht."""
+        with self._cond:
+            return self._events_since(seq)
+
+    def _events_since(self, seq):
+        # Aufrufer hält self._cond
+        if seq == self._seq:
+            return [], self._seq
+        # Nummer aus der Zukunft (Neustart des Servers) oder bereits aus dem Puffer gefallen
+        if seq > self._seq or not self._events or self._events[0][0] > seq + 1:
+            return None, self._seq
+        skip = seq + 1 - self._events[0][0]
+        return [payload for _, payload in list(self._events)[skip:]], self._seq
+
+    def wait(self, seq, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq, timeout)
+            return self._events_since(seq)
+
+    def stream(self, last_seq=None, keepalive=15.0):
+        """Erzeugt den SSE-Datenstrom für einen Abonnenten (blockierend, für WSGI)."""
+        events = None
+        if last_seq is not None:
+            events, new_seq = self.events_since(last_seq)
+            if events is not None:
+                last_seq = new_seq
+        while True:
+            if events is None:
+                last_seq, view = self.snapshot()
+                yield self.encode(last_seq, "snapshot", view)
+            else:
+                yield from events
+            events, new_seq = self.wait(last_seq, keepalive)
+            if events == [] and new_seq == last_seq:
+                yield b": keepalive\n\n"
+            elif events is not None:
+                last_seq = new_seq
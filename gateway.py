@@ -0,0 +1,325 @@
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from threading import Lock
+from types import SimpleNamespace
+import httpx
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+from zeitreihen import SensorStore
+
+# Gateway für viele Gardening Boxen: sammelt die Messrahmen aller registrierten
+# Box-Steuerungen (projekt.py) nebenläufig ein, speichert sie je Box in einer
+# eigenen Datenbank und verteilt Zeitplan- und Modusänderungen parallel an Gruppen.
+
+BOXES_FILE = os.getenv("BOXES_FILE", "boxen.json")
+DATA_DIR = os.getenv("GATEWAY_DATA_DIR", "gateway_daten")
+POLL_INTERVAL = 10.0  # Sekunden zwischen zwei Abfragerunden
+FLUSH_INTERVAL = 60.0  # Sekunden zwischen zwei Schreibvorgängen der Box-Datenbanken
+MAX_CONCURRENCY = 100  # gleichzeitige Anfragen an Boxen
+REQUEST_TIMEOUT = 5.0
+
+
+class BoxRegistry:
+    """Registrierte Boxen (id -> {"url", "groups"}), gespeichert als JSON-Datei."""
+
+    def __init__(self, path):
+        self.path = path
+        self.boxes = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.boxes = json.load(file)
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(self.boxes, file, indent=4)
+
+    def register(self, box_id, url, groups=()):
+        self.boxes[box_id] = {"url": url.rstrip("/"), "groups": list(groups)}
+        self.save()
+
+    def remove(self, box_id):
+        if self.boxes.pop(box_id, None) is not None:
+            self.save()
+
+    def select(self, group=None):
+        """Ids aller Boxen, bei Angabe einer Gruppe nur deren Mitglieder ("all" = alle)."""
+        return [
+            box_id for box_id, box in self.boxes.items()
+            if group in (None, "all") or group in box["groups"]
+        ]
+
+
+class FleetGateway:
+    """Fragt alle Boxen über einen gemeinsamen Verbindungspool ab und schreibt je Box in eine Datenbank.
+
+    Die Datenbanken werden nur in Worker-Threads angefasst (asyncio.to_thread):
+    abgefragte Rahmen sammelt die Schleife in eigenen Listen und übergibt sie
+    erst beim Schreiben, damit ein laufendes flush_all die Schleife nie über
+    den Lock eines SensorStore aufhält.
+    """
+
+    def __init__(self, registry, data_dir=DATA_DIR, max_concurrency=MAX_CONCURRENCY):
+        self.registry = registry
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self.client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._stores = {}
+        self._stores_lock = Lock()
+        self._ingest_locks = {}  # id -> Lock, ein Upload je Box zur Zeit
+        self._polled = {}  # id -> abgefragte, noch nicht übergebene Rahmen; nur in der Schleife verändert
+        self._last_polled = {}  # id -> Zeitstempel des zuletzt übernommenen Rahmens
+        self.last_seen = {}  # id -> Zeitpunkt der letzten erfolgreichen Abfrage
+
+    def store(self, box_id):
+        """Datenbank-Shard einer Box; geschrieben wird nur über flush_all()."""
+        with self._stores_lock:
+            store = self._stores.get(box_id)
+            if store is None:
+                store = SensorStore(
+                    os.path.join(self.data_dir, f"{box_id}.db"),
+                    batch_size=float("inf"), flush_interval=float("inf"),
+                )
+                self._stores[box_id] = store
+                self._ingest_locks[box_id] = Lock()
+        return store
+
+    async def _request(self, box_id, method, path, payload=None):
+        url = self.registry.boxes[box_id]["url"] + path
+        async with self._semaphore:
+            try:
+                response = await self.client.request(method, url, json=payload)
+                return box_id, response.status_code, response.json()
+            except (httpx.HTTPError, ValueError) as ex:
+                return box_id, None, {"error": str(ex)}
+
+    async def poll_box(self, box_id):
+        box_id, status, data = await self._request(box_id, "GET", "/get_sensordata")
+        if status != 200:
+            return False
+        self.last_seen[box_id] = time.time()
+        # Eine ruhige Box misst seltener als abgefragt wird; denselben Rahmen nicht erneut zählen
+        if data["timestamp"] <= self._last_polled.get(box_id, float("-inf")):
+            return True
+        self._last_polled[box_id] = data["timestamp"]
+        self._polled.setdefault(box_id, []).append(SimpleNamespace(raw={}, **data))
+        return True
+
+    async def poll_all(self):
+        results = await asyncio.gather(*(self.poll_box(box_id) for box_id in self.registry.select()))
+        return sum(results)
+
+    async def fan_out(self, group, path, payload):
+        """Schickt dieselbe Änderung parallel an alle Boxen einer Gruppe."""
+        results = await asyncio.gather(
+            *(self._request(box_id, "POST", path, payload) for box_id in self.registry.select(group))
+        )
+        return {box_id: {"status_code": status, "response": data} for box_id, status, data in results}
+
+    async def query(self, box_id, start, end):
+        """Liefert (Felder, Zeilen) einer Box einschließlich der noch nicht übergebenen Rahmen."""
+        polled = [frame for frame in self._polled.get(box_id, ()) if start <= frame.timestamp < end]
+
+        def read():
+            store = self.store(box_id)
+            return store.fields, store.query(start, end)
+
+        fields, rows = await asyncio.to_thread(read)
+        # Inzwischen übergebene Rahmen stehen schon in `rows`
+        last = rows[-1][0] if rows else float("-inf")
+        rows += [
+            (frame.timestamp,) + tuple(getattr(frame, field, None) for field in fields)
+            for frame in polled if frame.timestamp > last
+        ]
+        return fields, rows
+
+    def ingest(self, box_id, frames):
+        """Übernimmt hochgeladene Rahmen ({"seq", "frame"}); bereits bekannte Nummern werden verworfen."""
+        store = self.store(box_id)
+        # Wiederholt die Box nach einem Timeout, während der erste Versuch noch läuft,
+        # darf der zweite erst nach dem Festhalten der Nummer prüfen
+        with self._ingest_locks[box_id]:
+            last_seq = store.get_meta("last_seq", 0)
+            accepted = 0
+            for item in frames:
+                if item["seq"] <= last_seq:
+                    continue
+                frame = item["frame"]
+                store.append(SimpleNamespace(**dict(frame, raw=frame.get("raw") or {})))
+                last_seq = item["seq"]
+                accepted += 1
+            # Erst schreiben, dann die Nummer festhalten: ein Absturz dazwischen führt
+            # höchstens zu einem erneut gesendeten, nicht zu einem verlorenen Stapel
+            store.flush()
+            store.set_meta("last_seq", last_seq)
+        self.last_seen[box_id] = time.time()
+        return accepted, last_seq
+
+    def flush_all(self, polled=None):
+        """Übernimmt abgefragte Rahmen ({id: [Rahmen]}) und schreibt alle Datenbanken; läuft im Thread."""
+        for box_id, frames in (polled or {}).items():
+            store = self.store(box_id)
+            for frame in frames:
+                store.append(frame)
+        for store in list(self._stores.values()):
+            store.flush()
+
+    async def run(self, poll_interval=POLL_INTERVAL, flush_interval=FLUSH_INTERVAL):
+        last_flush = time.monotonic()
+        while True:
+            started = time.monotonic()
+            await self.poll_all()
+            if started - last_flush >= flush_interval:
+                # SQLite-Schreibvorgänge außerhalb der Ereignisschleife
+                polled, self._polled = self._polled, {}
+                await asyncio.to_thread(self.flush_all, polled)
+                last_flush = started
+            await asyncio.sleep(max(0.0, poll_interval - (time.monotonic() - started)))
+
+    async def close(self):
+        await self.client.aclose()
+        polled, self._polled = self._polled, {}
+        await asyncio.to_thread(self.flush_all, polled)
+
+
+def create_app(registry_path=BOXES_FILE, data_dir=DATA_DIR):
+    gateway = None
+
+    @asynccontextmanager
+    async def lifespan(app):
+        nonlocal gateway
+        gateway = FleetGateway(BoxRegistry(registry_path), data_dir)
+        task = asyncio.create_task(gateway.run())
+        yield
+        task.cancel()
+        await gateway.close()
+
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+    @app.get("/boxes")
+    async def get_boxes():
+        return {
+            box_id: dict(box, last_seen=gateway.last_seen.get(box_id))
+            for box_id, box in gateway.registry.boxes.items()
+        }
+
+    @app.post("/boxes")
+    async def register_box(request: Request):
+        data = await request.json()
+        if not data.get("id") or not data.get("url"):
+            return ORJSONResponse({"error": "Fehlende erforderliche Parameter"}, status_code=400)
+        gateway.registry.register(data["id"], data["url"], data.get("groups", ()))
+        return {"status": "success"}
+
+    @app.get("/boxes/{box_id}/sensordata")
+    async def get_box_sensordata(box_id: str, start: float = None, end: float = None):
+        if box_id not in gateway.registry.boxes:
+            return ORJSONResponse({"error": "Unbekannte Box"}, status_code=404)
+        end = time.time() if end is None else end
+        start = end - 86400 if start is None else start
+        fields, rows = await gateway.query(box_id, start, end)
+        columns = ("timestamp",) + fields
+        return {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+
+    @app.post("/ingest")
+    async def ingest(request: Request):
+        body = await request.body()
+        if request.headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        data = orjson.loads(body)
+        if not data.get("box"):
+            return ORJSONResponse({"error": "Fehlende erforderliche Parameter"}, status_code=400)
+        accepted, last_seq = await asyncio.to_thread(gateway.ingest, data["box"], data.get("frames", []))
+        return {"accepted": accepted, "acked_seq": last_seq}
+
+    @app.post("/groups/{group}/set_schedule")
+    async def set_group_schedule(group: str, request: Request):
+        return await gateway.fan_out(group, "/set_schedule", await request.json())
+
+    @app.post("/groups/{group}/set_update_status")
+    async def set_group_update_status(group: str, request: Request):
+        return await gateway.fan_out(group, "/set_update_status", await request.json())
+
+    return app
+
+
+def create_stub_app(box_id):
+    """Minimale Nachbildung der projekt.py-API mit Zufallswerten, zum Testen des Gateways."""
+    app = FastAPI(default_response_class=ORJSONResponse)
+    schedules = {
+        "light": {"start": "06:00", "end": "18:00", "interval": None, "duration": None},
+        "pump": {"start": "06:00", "end": "18:00", "interval": None, "duration": None},
+        "fan": {"start": "10:00", "end": "18:00", "interval": 30, "duration": 5},
+    }
+    status = {"status": {"light": False, "pump": False, "fan": False},
+              "modes": {"light": "automatisch", "pump": "automatisch", "fan": "automatisch"}}
+
+    @app.get("/get_sensordata")
+    async def get_sensordata():
+        return {
+            "timestamp": time.time(),
+            "soil_moisture": random.uniform(30, 70),
+            "water_level": random.uniform(10, 100),
+            "power_consumption": random.uniform(0, 60),
+        }
+
+    @app.get("/get_schedule")
+    async def get_schedule():
+        return schedules
+
+    @app.post("/set_schedule")
+    async def set_schedule(request: Request):
+        data = await request.json()
+        if data.get("component") not in schedules:
+            return ORJSONResponse({"error": "Ungültige Komponente"}, status_code=400)
+        schedules[data["component"]] = {key: data.get(key) for key in ("start", "end", "interval", "duration")}
+        return {"message": f"Zeitplan für {data['component']} auf {box_id} aktualisiert."}
+
+    @app.get("/get_update_status")
+    async def get_update_status():
+        return status
+
+    @app.post("/set_update_status")
+    async def set_update_status(request: Request):
+        data = await request.json()
+        status["status"].update(data.get("status") or {})
+        status["modes"].update(data.get("modes") or {})
+        return {"status": "success"}
+
+    return app
+
+
+async def serve_stubs(count, first_port, host="127.0.0.1"):
+    servers = [
+        uvicorn.Server(uvicorn.Config(create_stub_app(f"stub{i}"), host=host, port=first_port + i, log_level="warning"))
+        for i in range(count)
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gateway für mehrere Gardening Boxen")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Gateway starten")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8000)
+    stub = commands.add_parser("stub", help="Lokale Stub-Instanzen der Box-API starten")
+    stub.add_argument("--count", type=int, default=10)
+    stub.add_argument("--port", type=int, default=5100)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        uvicorn.run(create_app(), host=args.host, port=args.port)
+    else:
+        asyncio.run(serve_stubs(args.count, args.port))
@@ -0,0 +1,222 @@
+import math
+import random
+import time
+from datetime import datetime
+from threading import Lock
+import numpy as np
+
+# Hardware-Abstraktion: die Steuerung spricht GPIO und SPI nur über ein Board-
+# Objekt an. PiBoard nutzt RPi.GPIO und spidev (erst beim Erzeugen importiert),
+# SimulatedBoard bildet Boden, Tank und Stromaufnahme nach und läuft zusammen
+# mit SimClock schneller als in Echtzeit.
+
+
+class Clock:
+    """Echtzeituhr; Schnittstelle für alle Zeitabfragen der Steuerung."""
+
+    speed = 1.0
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def now(self):
+        return datetime.now()
+
+    def real_seconds(self, seconds):
+        """Echte Wartezeit für `seconds` Sekunden Uhrzeit."""
+        return seconds
+
+
+class SimClock(Clock):
+    """Uhr, die `speed`-mal so schnell läuft wie die echte (z. B. 60: eine Stunde pro Minute)."""
+
+    def __init__(self, speed=60.0, start=None):
+        self.speed = speed
+        self._real_start = time.monotonic()
+        self._time_start = time.time() if start is None else start
+
+    def _elapsed(self):
+        return (time.monotonic() - self._real_start) * self.speed
+
+    def time(self):
+        return self._time_start + self._elapsed()
+
+    def monotonic(self):
+        return self._real_start + self._elapsed()
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def real_seconds(self, seconds):
+        return seconds / self.speed
+
+
+class PiBoard:
+    """Raspberry Pi mit MCP3008 an SPI 0.0 und Relais an GPIO (BCM-Nummern)."""
+
+    def __init__(self, spi_bus=0, spi_device=0, spi_speed_hz=1350000):
+        import RPi.GPIO as GPIO
+        import spidev
+        self._gpio = GPIO
+        GPIO.setmode(GPIO.BCM)
+        self._spi = spidev.SpiDev()
+        self._spi.open(spi_bus, spi_device)
+        self._spi.max_speed_hz = spi_speed_hz
+
+    def setup_output(self, pin, high):
+        self._gpio.setup(pin, self._gpio.OUT, initial=self._gpio.HIGH if high else self._gpio.LOW)
+
+    def output(self, pin, high):
+        self._gpio.output(pin, self._gpio.HIGH if high else self._gpio.LOW)
+
+    def read_adc(self, channel):
+        adc = self._spi.xfer2([1, (8 + channel) << 4, 0])
+        return ((adc[1] & 3) << 8) + adc[2]
+
+    def capture(self, channel, buffer):
+        """Tastet einen Kanal in einer engen Schleife in `buffer` ab; liefert die Dauer in Sekunden."""
+        xfer2 = self._spi.xfer2
+        command = (8 + channel) << 4
+        start = time.perf_counter()
+        for i in range(len(buffer)):
+            adc = xfer2([1, command, 0])
+            buffer[i] = ((adc[1] & 3) << 8) + adc[2]
+        return time.perf_counter() - start
+
+
+class SimulatedBoard:
+    """Einfaches Modell einer Box für Tests und Messungen ohne Hardware.
+
+    Der Boden trocknet stetig aus; gepumptes Wasser senkt den Tankstand sofort
+    und kommt mit der Zeitkonstante `soak_tau` beim Feuchtesensor an. Der
+    Stromsensor liefert eine 50-Hz-Sinuskurve, deren Amplitude der Nennleistung
+    der eingeschalteten Relais entspricht. Rohwerte entstehen über die
+    Umkehrung der Kalibrierkurven, sodass die Steuerung unverändert rechnet.
+    """
+
+    def __init__(self, registry, calibration, clock, soil=45.0, tank=80.0, dry_rate=2.0,
+                 pump_soil_rate=0.1, pump_tank_rate=0.02, soak_tau=60.0, idle_watts=2.0,
+                 mains_voltage=230.0, mains_frequency=50.0, power_factor=0.9, sensitivity=0.066,
+                 sample_rate=6000.0, noise=1.0):
+        self.registry = registry
+        self.clock = clock
+        self.soil = soil  # %
+        self.tank = tank  # %
+        self.dry_rate = dry_rate / 3600  # %/s
+        self.pump_soil_rate = pump_soil_rate  # % Bodenfeuchte je Pumpensekunde
+        self.pump_tank_rate = pump_tank_rate  # % Tankstand je Pumpensekunde
+        self.soak_tau = soak_tau
+        self.idle_watts = idle_watts
+        self.mains_voltage = mains_voltage
+        self.mains_frequency = mains_frequency
+        self.power_factor = power_factor
+        self.sensitivity = sensitivity
+        self.sample_rate = sample_rate
+        self.noise = noise
+        self.levels = {}  # Pin -> True (HIGH) / False (LOW)
+        self._pins = {actuator.pin: actuator for actuator in registry.actuators.values()}
+        self._in_transit = 0.0  # gepumptes, noch nicht angekommenes Wasser in % Bodenfeuchte
+        self._last = clock.monotonic()
+        self._lock = Lock()
+        # Rollen der Kanäle aus der Registry ableiten
+        self._pumps = {a.pin for a in registry.actuators.values() if a.controller == "irrigation"}
+        soil_sensors = {a.irrigation.sensor for a in registry.actuators.values() if a.irrigation}
+        tank_sensors = {
+            lock.sensor for a in registry.actuators.values() if a.controller == "irrigation"
+            for lock in a.interlocks if lock.min is not None
+        }
+        self._roles = {}
+        self._inverse = {}
+        raw = np.arange(1024)
+        for name, sensor in registry.sensors.items():
+            if sensor.conversion == "power":
+                self._roles[sensor.channel] = "current"
+                continue
+            if name in soil_sensors:
+                self._roles[sensor.channel] = "soil"
+            elif name in tank_sensors:
+                self._roles[sensor.channel] = "tank"
+            else:
+                continue
+            if sensor.conversion == "calibration" and name in calibration:
+                self._inverse[sensor.channel] = np.asarray(calibration.convert_array(name, raw), dtype=float)
+
+    def setup_output(self, pin, high):
+        self.output(pin, high)
+
+    def output(self, pin, high):
+        with self._lock:
+            self._advance()
+            self.levels[pin] = high
+
+    def _on(self, pin):
+        actuator = self._pins.get(pin)
+        level = self.levels.get(pin)
+        return actuator is not None and level is not None and level != actuator.active_low
+
+    def _advance(self):
+        # Aufrufer hält self._lock; schreibt das Modell bis zur aktuellen Uhrzeit fort
+        now = self.clock.monotonic()
+        dt, self._last = now - self._last, now
+        if dt <= 0:
+            return
+        pumping = any(self._on(pin) for pin in self._pumps) and self.tank > 0
+        if pumping:
+            self.tank = max(0.0, self.tank - self.pump_tank_rate * dt)
+            self._in_transit += self.pump_soil_rate * dt
+        arrived = self._in_transit * (1 - math.exp(-dt / self.soak_tau))
+        self._in_transit -= arrived
+        self.soil = min(100.0, max(0.0, self.soil + arrived - self.dry_rate * dt))
+
+    def watts(self):
+        return self.idle_watts + sum(
+            self._pins[pin].nominal_watts for pin in self._pins if self._on(pin)
+        )
+
+    def _raw_for(self, channel, value):
+        table = self._inverse.get(channel)
+        if table is None:
+            return int(round(value / 100 * 1023))
+        return int(np.abs(table - value).argmin())
+
+    def _current_sample(self, t):
+        amplitude = self.watts() / (self.mains_voltage * self.power_factor) * math.sqrt(2)
+        volts = 2.5 + amplitude * self.sensitivity * math.sin(2 * math.pi * self.mains_frequency * t)
+        return int(round(volts / 5.0 * 1023 + random.gauss(0, self.noise)))
+
+    def read_adc(self, channel):
+        with self._lock:
+            self._advance()
+            role = self._roles.get(channel)
+            if role == "soil":
+                raw = self._raw_for(channel, self.soil)
+            elif role == "tank":
+                raw = self._raw_for(channel, self.tank)
+            elif role == "current":
+                return min(1023, max(0, self._current_sample(self.clock.monotonic())))
+            else:
+                raw = 512
+        return min(1023, max(0, int(round(raw + random.gauss(0, self.noise)))))
+
+    def capture(self, channel, buffer):
+        with self._lock:
+            self._advance()
+            start = self.clock.monotonic()
+            if self._roles.get(channel) == "current":
+                t = start + np.arange(len(buffer)) / self.sample_rate
+                amplitude = self.watts() / (self.mains_voltage * self.power_factor) * math.sqrt(2)
+                volts = 2.5 + amplitude * self.sensitivity * np.sin(2 * np.pi * self.mains_frequency * t)
+                samples = volts / 5.0 * 1023 + np.random.normal(0, self.noise, len(buffer))
+            else:
+                samples = np.full(len(buffer), 512.0)
+            buffer[:] = np.clip(np.round(samples), 0, 1023)
+        return len(buffer) / self.sample_rate
+
+    def snapshot(self):
+        with self._lock:
+            self._advance()
+            return {"soil_moisture": self.soil, "tank": self.tank, "watts": self.watts(),
+                    "relays": {self._pins[pin].name: self._on(pin) for pin in self._pins}}
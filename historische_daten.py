@@ -1,62 +1,72 @@
 import streamlit as st
 import pandas as pd
 import datetime
+from schnittstelle import get_json
+
+# Vorberechnete Aggregate der Box laden; die Kosten hängen nicht von der Länge der Historie ab
+@st.cache_data(ttl=60)
+def load_rollups(period, start):
+    return get_json("/get_rollups", period=period, start=start)
+
+@st.cache_data(ttl=60)
+def load_energy(period, start):
+    return get_json("/get_energy", period=period, start=start)
+
+def energy_kwh(data):
+    """Summiert die Wh-Zähler aller Komponenten je Bucket zu kWh."""
+    totals = {}
+    for buckets in data["buckets"].values():
+        for bucket in buckets:
+            totals[bucket["bucket"]] = totals.get(bucket["bucket"], 0.0) + bucket["wh"] / 1000
+    return pd.Series(totals, dtype=float).sort_index()
+
+def rollup_frame(rows):
+    """Wandelt die Aggregate einer Messgröße in einen DataFrame mit Datumsindex um."""
+    df = pd.DataFrame(rows)
+    df["bucket"] = pd.to_datetime(df["bucket"])
+    return df.set_index("bucket")
+
+def show_metric(daily, monthly, metric, title, unit):
+    st.write(f"### {title} ({unit})")
+    if daily and daily.get(metric):
+        df = rollup_frame(daily[metric])
+        st.line_chart(df[["min", "mean", "max"]])
+        current_month = monthly[metric][-1] if monthly and monthly.get(metric) else None
+        if current_month:
+            st.write(f"**Durchschnitt im Monat {current_month['bucket']}:** {current_month['mean']:.2f} {unit} "
+                     f"(min. {current_month['min']:.2f}, max. {current_month['max']:.2f})")
+    else:
+        st.write(f"Keine Daten zu {title} verfügbar.")
 
 def app():
     st.title("📊 Historische Daten")
     st.write("In diesem Bereich können Sie die Verbrauchs- und Anbaudaten Ihrer Gardening Box einsehen.")
 
-    # Initialisiere Beispiel-Daten (Simulation von Sensor-Daten)
-    if "historical_data" not in st.session_state:
-        st.session_state.historical_data = {
-            "electricity": [
-                {"date": "2024-11-01", "consumption": 3.5},
-                {"date": "2024-11-02", "consumption": 4.0},
-                {"date": "2024-11-03", "consumption": 3.8},
-            ],
-            "water": [
-                {"date": "2024-11-01", "consumption": 50},
-                {"date": "2024-11-02", "consumption": 45},
-                {"date": "2024-11-03", "consumption": 48},
-            ],
-            "plants": [
-                {"plant": "Lauchzwiebel", "planted": "2024-10-01", "harvested": "2024-12-15"},
-            ],
-        }
+    # Tageswerte der letzten 31 Tage und Monatswerte des letzten Jahres
+    today = datetime.date.today()
+    daily = load_rollups("day", (today - datetime.timedelta(days=31)).isoformat())
+    monthly = load_rollups("month", (today - datetime.timedelta(days=365)).strftime("%Y-%m"))
+
+    if daily is None:
+        st.warning("Die Gardening Box ist nicht erreichbar.")
 
     # Verbrauchsdaten (Strom und Wasser) anzeigen
     st.subheader("Monatlicher Verbrauch")
 
     # Stromverbrauch
     st.write("### Stromverbrauch (kWh)")
-    electricity_df = pd.DataFrame(st.session_state.historical_data["electricity"])
-    if not electricity_df.empty:
-        electricity_df["date"] = pd.to_datetime(electricity_df["date"])
-        monthly_electricity = electricity_df.groupby(electricity_df["date"].dt.strftime('%Y-%m'))["consumption"].sum()
-        st.line_chart(electricity_df.set_index("date")["consumption"])
-        st.write(f"**Gesamter Stromverbrauch im Monat:** {monthly_electricity.iloc[-1]:.2f} kWh")
+    daily_energy = load_energy("day", (today - datetime.timedelta(days=31)).isoformat())
+    monthly_energy = load_energy("month", today.strftime("%Y-%m"))
+    if daily_energy and daily_energy["buckets"]:
+        daily_kwh = energy_kwh(daily_energy)
+        daily_kwh.index = pd.to_datetime(daily_kwh.index)
+        st.line_chart(daily_kwh)
+        # Monatswerte werden getrennt zwischengespeichert und können fehlen
+        if monthly_energy and monthly_energy["buckets"]:
+            st.write(f"**Gesamter Stromverbrauch im Monat:** {energy_kwh(monthly_energy).iloc[-1]:.2f} kWh")
     else:
         st.write("Keine Daten zum Stromverbrauch verfügbar.")
 
-    # Wasserverbrauch
-    st.write("### Wasserverbrauch (Liter)")
-    water_df = pd.DataFrame(st.session_state.historical_data["water"])
-    if not water_df.empty:
-        water_df["date"] = pd.to_datetime(water_df["date"])
-        monthly_water = water_df.groupby(water_df["date"].dt.strftime('%Y-%m'))["consumption"].sum()
-        st.line_chart(water_df.set_index("date")["consumption"])
-        st.write(f"**Gesamter Wasserverbrauch im Monat:** {monthly_water.iloc[-1]:.2f} Liter")
-    else:
-        st.write("Keine Daten zum Wasserverbrauch verfügbar.")
-
-    # Daten zurücksetzen
-    st.write("### Daten zurücksetzen")
-    if st.button("Alle historischen Daten löschen"):
-        st.session_state.historical_data = {
-            "electricity": [],
-            "water": [],
-            "plants": [],
-        }
-        st.warning("Alle Daten wurden gelöscht.")
-
-
+    show_metric(daily, monthly, "power_consumption", "Leistungsaufnahme", "W")
+    show_metric(daily, monthly, "water_level", "Wasserstand", "%")
+    show_metric(daily, monthly, "soil_moisture", "Bodenfeuchtigkeit", "%")
@@ -0,0 +1,108 @@
+import bisect
+import json
+import os
+from threading import Lock
+import numpy as np
+
+# Kalibrierkurven der Sensoren (ADC-Rohwert -> physikalischer Wert), geladen aus einer
+# JSON-Datei. Änderungen an der Datei werden ohne Neustart übernommen.
+
+
+class PiecewiseCurve:
+    """Stückweise lineare Kurve durch Stützpunkte (Rohwert, Wert); außerhalb wird begrenzt."""
+
+    def __init__(self, points):
+        points = sorted(points)
+        self.xs = [float(x) for x, _ in points]
+        self.ys = [float(y) for _, y in points]
+
+    def __call__(self, raw):
+        i = bisect.bisect_right(self.xs, raw)
+        if i == 0:
+            return self.ys[0]
+        if i == len(self.xs):
+            return self.ys[-1]
+        x0, x1 = self.xs[i - 1], self.xs[i]
+        y0, y1 = self.ys[i - 1], self.ys[i]
+        return y0 + (y1 - y0) * (raw - x0) / (x1 - x0)
+
+    def convert_array(self, raw):
+        return np.interp(np.asarray(raw, dtype=np.float64), self.xs, self.ys)
+
+
+class PolynomialCurve:
+    """Polynom (Koeffizienten mit der höchsten Potenz zuerst), optional auf [min, max] begrenzt."""
+
+    def __init__(self, coeffs, minimum=None, maximum=None):
+        self.coeffs = [float(c) for c in coeffs]
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __call__(self, raw):
+        value = 0.0
+        for coeff in self.coeffs:
+            value = value * raw + coeff
+        if self.minimum is not None:
+            value = max(value, self.minimum)
+        if self.maximum is not None:
+            value = min(value, self.maximum)
+        return value
+
+    def convert_array(self, raw):
+        values = np.polyval(self.coeffs, np.asarray(raw, dtype=np.float64))
+        if self.minimum is not None or self.maximum is not None:
+            values = np.clip(values, self.minimum, self.maximum)
+        return values
+
+
+def build_curve(spec):
+    if spec["type"] == "piecewise":
+        return PiecewiseCurve(spec["points"])
+    if spec["type"] == "polynomial":
+        return PolynomialCurve(spec["coeffs"], spec.get("min"), spec.get("max"))
+    raise ValueError(f"Unbekannter Kurventyp: {spec['type']}")
+
+
+class Calibration:
+    """Hält die Kurven aller Sensoren und lädt sie neu, sobald sich die Datei ändert.
+
+    Für jeden Sensor in `required` muss die Datei eine Kurve enthalten, sonst
+    schlägt schon der Start fehl; ein Neuladen ohne eine davon wird abgelehnt.
+    """
+
+    def __init__(self, path, required=()):
+        self.path = path
+        self.required = tuple(required)
+        self._curves = {}
+        self._mtime = None
+        self._lock = Lock()
+        self.reload()
+
+    def reload(self):
+        with open(self.path, encoding="utf-8") as file:
+            specs = json.load(file)
+        missing = [sensor for sensor in self.required if sensor not in specs]
+        if missing:
+            raise ValueError(f"Keine Kalibrierkurve für {', '.join(missing)}")
+        # Erst alle Kurven bauen, dann als Ganzes tauschen: ein Fehler lässt die alten aktiv
+        curves = {sensor: build_curve(spec) for sensor, spec in specs.items()}
+        with self._lock:
+            self._curves = curves
+            self._mtime = os.stat(self.path).st_mtime_ns
+        return sorted(curves)
+
+    def check_reload(self):
+        """Lädt neu, wenn sich die Datei geändert hat; liefert True bei einem Neuladen."""
+        if os.stat(self.path).st_mtime_ns == self._mtime:
+            return False
+        self.reload()
+        return True
+
+    def __contains__(self, sensor):
+        return sensor in self._curves
+
+    def convert(self, sensor, raw):
+        return self._curves[sensor](raw)
+
+    def convert_array(self, sensor, raw):
+        return self._curves[sensor].convert_array(raw)
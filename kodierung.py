@@ -0,0 +1,86 @@
+import hashlib
+import os
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # optional; ohne msgpack wird immer JSON geliefert
+    msgpack = None
+
+# Kodierung der API-Antworten: JSON über orjson oder, wenn der Client es per
+# Accept anfordert, msgpack. Lesende Endpunkte liefern ein ETag; stimmt es mit
+# If-None-Match überein, genügt ein 304 ohne Inhalt. Antworten zu versionierten
+# Daten (z. B. dem Steuerzustand) werden je Version einmal kodiert und danach
+# unverändert ausgeliefert.
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+JSON_TYPES = (JSON, "application/*", "*/*")
+# Versionsnummern beginnen nach einem Neustart wieder bei 0; die Start-Id hält alte ETags ungültig
+BOOT_ID = os.urandom(4).hex()
+
+
+def negotiate(accept):
+    """Medientyp zum Accept-Header; msgpack nur auf ausdrücklichen Wunsch und wenn installiert."""
+    if msgpack is None or not accept:
+        return JSON
+    msgpack_q = json_q = 0.0
+    for item in accept.split(","):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in JSON_TYPES:
+            json_q = max(json_q, q)
+    return MSGPACK if msgpack_q > 0 and msgpack_q >= json_q else JSON
+
+
+def encode(data, media_type=JSON):
+    if media_type == MSGPACK:
+        return msgpack.packb(data, use_bin_type=True)
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def content_etag(body):
+    """ETag aus dem kodierten Inhalt für Antworten ohne eigene Versionsnummer."""
+    return '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """Kodierte Antworten je Schlüssel und Medientyp, neu erzeugt nur bei neuer Version.
+
+    `get(key, version, build, media_type)` ruft `build()` nur auf, wenn für
+    `key` noch keine Antwort zu `version` vorliegt, und kodiert je Medientyp
+    höchstens einmal. Gleichzeitige Anfragen können doppelt bauen; das Ergebnis
+    ist dasselbe, gespeichert wird immer ein vollständiger Eintrag.
+    """
+
+    def __init__(self):
+        self._entries = {}  # Schlüssel -> (Version, Daten, {Medientyp: (ETag, Inhalt)})
+
+    def get(self, key, version, build, media_type=JSON):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            entry = self._entries[key] = (version, build(), {})
+        encoded = entry[2].get(media_type)
+        if encoded is None:
+            suffix = "m" if media_type == MSGPACK else "j"
+            encoded = entry[2][media_type] = (
+                f'"{BOOT_ID}-{key}-{version}-{suffix}"', encode(entry[1], media_type),
+            )
+        return encoded
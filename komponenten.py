@@ -0,0 +1,132 @@
+import json
+import keyword
+from collections import namedtuple
+
+# Deklarative Beschreibung der Box: welche Relais (Aktoren) und welche
+# ADC-Kanäle (Sensoren) es gibt und wie sie gesteuert bzw. umgerechnet werden.
+# projekt.py baut daraus Abtastung, Planung und Relaisvergabe generisch auf.
+
+ADC_CHANNELS = 8  # MCP3008
+CONVERSIONS = ("calibration", "power", "raw")
+CONTROLLERS = ("schedule", "irrigation")
+# Felder des Messrahmens neben den Sensoren
+RESERVED_NAMES = ("timestamp", "raw")
+
+SensorSpec = namedtuple(
+    "SensorSpec", ["name", "channel", "conversion", "min_period", "max_period", "threshold", "active_with"]
+)
+ActuatorSpec = namedtuple(
+    "ActuatorSpec", ["name", "pin", "active_low", "nominal_watts", "schedule", "controller", "interlocks", "irrigation"]
+)
+# Der Aktor darf nur laufen, solange min < Messwert < max gilt (Grenzen optional)
+Interlock = namedtuple("Interlock", ["sensor", "min", "max"])
+IrrigationSpec = namedtuple("IrrigationSpec", ["sensor", "band", "flow_lpm", "max_cycle_seconds"])
+
+DEFAULT_SCHEDULE = {"start": "06:00", "end": "18:00"}
+
+
+class ComponentRegistry:
+    """Aktoren und Sensoren einer Box, geprüft beim Laden.
+
+    Format (JSON):
+        {"sensors": {"<name>": {"channel": 0-7, "conversion": "calibration" | "power" | "raw",
+                                "min_period": s, "max_period": s, "threshold": x,
+                                "active_with": ["<aktor>", ...]}},
+         "actuators": {"<name>": {"pin": BCM-Nummer, "active_low": true, "nominal_watts": W,
+                                  "schedule": {"start", "end", "interval", "duration"},
+                                  "controller": "schedule" | "irrigation",
+                                  "interlocks": [{"sensor", "min", "max"}],
+                                  "irrigation": {"sensor", "band", "flow_lpm", "max_cycle_seconds"}}}}
+    """
+
+    def __init__(self, sensors, actuators):
+        self.sensors = sensors
+        self.actuators = actuators
+        self._validate()
+
+    @classmethod
+    def from_dict(cls, data):
+        sensors = {
+            name: SensorSpec(
+                name,
+                int(spec["channel"]),
+                spec.get("conversion", "calibration"),
+                float(spec.get("min_period", 1.0)),
+                float(spec.get("max_period", 60.0)),
+                float(spec.get("threshold", 1.0)),
+                tuple(spec.get("active_with", ())),
+            )
+            for name, spec in data.get("sensors", {}).items()
+        }
+        actuators = {}
+        for name, spec in data.get("actuators", {}).items():
+            irrigation = spec.get("irrigation")
+            actuators[name] = ActuatorSpec(
+                name,
+                int(spec["pin"]),
+                bool(spec.get("active_low", True)),
+                float(spec.get("nominal_watts", 1.0)),
+                dict(spec.get("schedule", DEFAULT_SCHEDULE)),
+                spec.get("controller", "schedule"),
+                tuple(
+                    Interlock(lock["sensor"], lock.get("min"), lock.get("max"))
+                    for lock in spec.get("interlocks", ())
+                ),
+                None if irrigation is None else IrrigationSpec(
+                    irrigation["sensor"],
+                    tuple(irrigation.get("band", (42.0, 50.0))),
+                    float(irrigation.get("flow_lpm", 1.0)),
+                    float(irrigation.get("max_cycle_seconds", 270.0)),
+                ),
+            )
+        return cls(sensors, actuators)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as file:
+            return cls.from_dict(json.load(file))
+
+    def _validate(self):
+        channels = [sensor.channel for sensor in self.sensors.values()]
+        if len(set(channels)) != len(channels):
+            raise ValueError("ADC-Kanal mehrfach belegt")
+        pins = [actuator.pin for actuator in self.actuators.values()]
+        if len(set(pins)) != len(pins):
+            raise ValueError("GPIO-Pin mehrfach belegt")
+        for sensor in self.sensors.values():
+            # Sensornamen werden Felder des Messrahmens und Spalten der Datenbank
+            if (not sensor.name.isidentifier() or keyword.iskeyword(sensor.name)
+                    or sensor.name.startswith("_") or sensor.name in RESERVED_NAMES):
+                raise ValueError(f"{sensor.name!r}: Sensorname muss ein Bezeichner sein")
+            if not 0 <= sensor.channel < ADC_CHANNELS:
+                raise ValueError(f"{sensor.name}: Kanal {sensor.channel} existiert nicht")
+            if sensor.conversion not in CONVERSIONS:
+                raise ValueError(f"{sensor.name}: unbekannte Umrechnung {sensor.conversion}")
+            if not 0 < sensor.min_period <= sensor.max_period:
+                raise ValueError(f"{sensor.name}: ungültige Abtastperioden")
+            for actuator in sensor.active_with:
+                if actuator not in self.actuators:
+                    raise ValueError(f"{sensor.name}: unbekannter Aktor {actuator}")
+        for actuator in self.actuators.values():
+            if actuator.controller not in CONTROLLERS:
+                raise ValueError(f"{actuator.name}: unbekannte Steuerung {actuator.controller}")
+            if actuator.controller == "irrigation" and actuator.irrigation is None:
+                raise ValueError(f"{actuator.name}: Bewässerung ohne Angaben unter \"irrigation\"")
+            sensors = [lock.sensor for lock in actuator.interlocks]
+            if actuator.irrigation is not None:
+                sensors.append(actuator.irrigation.sensor)
+            for sensor in sensors:
+                if sensor not in self.sensors:
+                    raise ValueError(f"{actuator.name}: unbekannter Sensor {sensor}")
+
+    def sensor_with(self, conversion):
+        """Name des ersten Sensors mit dieser Umrechnung oder None."""
+        return next((name for name, sensor in self.sensors.items() if sensor.conversion == conversion), None)
+
+    def interlocked(self, actuator, frame):
+        """True, wenn ein Messwert im Rahmen eine Sperre des Aktors verletzt."""
+        for lock in self.actuators[actuator].interlocks:
+            value = getattr(frame, lock.sensor)
+            if (lock.min is not None and value <= lock.min) or (lock.max is not None and value >= lock.max):
+                return True
+        return False
@@ -0,0 +1,375 @@
+import json
+import math
+import mmap
+import os
+import struct
+from threading import Lock
+
+# Kompakte Blockkodierung für lange Messreihen (Archiv auf der SD-Karte).
+#
+# Ein Block enthält bis zu einige tausend Zeilen (ts, *Spalten). Zeitstempel
+# werden in Millisekunden als Delta der Deltas abgelegt, Spalten entweder als
+# quantisierte ganzzahlige Deltas (ADC-Rohwerte, Messwerte mit fester
+# Auflösung) oder verlustfrei als XOR-verknüpfte Gleitkommazahlen. Jede Spalte
+# steht in einem eigenen Bitstrom; der Blockkopf enthält Zeitraum, Anzahl und
+# Min/Max je Spalte, damit Bereichsabfragen ganze Blöcke überspringen und nur
+# die benötigten Spalten dekodieren können.
+
+FILE_MAGIC = b"ZRA1"
+BLOCK_MAGIC = b"ZRB1"
+_BLOCK_HEADER = struct.Struct("<4sIIdd")  # Magic, Zeilen, Nutzdatenlänge, t_min, t_max
+_COLUMN_HEADER = struct.Struct("<BddI")  # Kodierung, Min, Max, Länge des Bitstroms
+_KIND_XOR, _KIND_DELTA = 0, 1
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+class _BitWriter:
+    def __init__(self):
+        self._buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value, bits):
+        self._acc = (self._acc << bits) | value
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._buffer.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def write_int(self, value):
+        """Vorzeichenbehaftete Ganzzahl mit Präfixcode: kleine Werte brauchen wenige Bits."""
+        value = _zigzag(value)
+        if value == 0:
+            self.write(0, 1)
+        elif value < 1 << 6:
+            self.write(0b10, 2)
+            self.write(value, 6)
+        elif value < 1 << 10:
+            self.write(0b110, 3)
+            self.write(value, 10)
+        elif value < 1 << 16:
+            self.write(0b1110, 4)
+            self.write(value, 16)
+        else:
+            self.write(0b1111, 4)
+            self.write(value, 64)
+
+    def getvalue(self):
+        if self._bits:
+            return bytes(self._buffer) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self._buffer)
+
+
+class _BitReader:
+    def __init__(self, data):
+        self._data = data
+        self._pos = 0
+
+    def read(self, bits):
+        start = self._pos >> 3
+        end = (self._pos + bits + 7) >> 3
+        chunk = int.from_bytes(self._data[start:end], "big")
+        shift = (end << 3) - self._pos - bits
+        self._pos += bits
+        return (chunk >> shift) & ((1 << bits) - 1)
+
+    def read_int(self):
+        if not self.read(1):
+            return 0
+        if not self.read(1):
+            return _unzigzag(self.read(6))
+        if not self.read(1):
+            return _unzigzag(self.read(10))
+        if not self.read(1):
+            return _unzigzag(self.read(16))
+        return _unzigzag(self.read(64))
+
+
+def _float_bits(value):
+    return struct.unpack("<Q", struct.pack("<d", value))[0]
+
+
+def _bits_float(bits):
+    return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+
+def _encode_timestamps(timestamps):
+    writer = _BitWriter()
+    previous = delta = 0
+    for i, ts in enumerate(timestamps):
+        ms = round(ts * 1000)
+        if i == 0:
+            writer.write_int(ms)
+        else:
+            writer.write_int(ms - previous - delta)
+            delta = ms - previous
+        previous = ms
+    return writer.getvalue()
+
+
+def _decode_timestamps(data, count):
+    reader = _BitReader(data)
+    previous = delta = 0
+    for i in range(count):
+        if i == 0:
+            previous = reader.read_int()
+        else:
+            delta += reader.read_int()
+            previous += delta
+        yield previous / 1000
+
+
+def _encode_xor(values):
+    # Gorilla-Verfahren: XOR mit dem Vorgänger, nur die signifikanten Bits werden gespeichert
+    writer = _BitWriter()
+    previous = 0
+    leading = trailing = None
+    for i, value in enumerate(values):
+        bits = _float_bits(math.nan if value is None else value)
+        if i == 0:
+            writer.write(bits, 64)
+        else:
+            xor = bits ^ previous
+            if not xor:
+                writer.write(0, 1)
+            else:
+                new_leading = min(64 - xor.bit_length(), 31)
+                new_trailing = (xor & -xor).bit_length() - 1
+                if leading is not None and new_leading >= leading and new_trailing >= trailing:
+                    writer.write(0b10, 2)
+                    writer.write(xor >> trailing, 64 - leading - trailing)
+                else:
+                    leading, trailing = new_leading, new_trailing
+                    size = 64 - leading - trailing
+                    writer.write(0b11, 2)
+                    writer.write(leading, 5)
+                    writer.write(size - 1, 6)
+                    writer.write(xor >> trailing, size)
+        previous = bits
+    return writer.getvalue()
+
+
+def _decode_xor(data, count):
+    reader = _BitReader(data)
+    previous = 0
+    leading = trailing = 0
+    for i in range(count):
+        if i == 0:
+            previous = reader.read(64)
+        elif reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                size = reader.read(6) + 1
+                trailing = 64 - leading - size
+            previous ^= reader.read(64 - leading - trailing) << trailing
+        value = _bits_float(previous)
+        yield None if value != value else value
+
+
+def _encode_delta(values, scale):
+    writer = _BitWriter()
+    previous = 0
+    for value in values:
+        quantized = round(value * scale)
+        writer.write_int(quantized - previous)
+        previous = quantized
+    return writer.getvalue()
+
+
+def _decode_delta(data, count, scale):
+    reader = _BitReader(data)
+    previous = 0
+    for _ in range(count):
+        previous += reader.read_int()
+        yield previous / scale
+
+
+def encode_block(rows, scales=()):
+    """Kodiert Zeilen (ts, *Spalten), aufsteigend nach Zeit, als Block.
+
+    `scales[i]` ist der Quantisierungsfaktor der Spalte i (z. B. 8 für den Median
+    aus acht ADC-Wandlungen, 100 für eine Auflösung von 0,01); ohne Faktor oder
+    bei fehlenden Werten wird die Spalte verlustfrei per XOR kodiert.
+    """
+    columns = list(zip(*rows))
+    streams = [_encode_timestamps(columns[0])]
+    headers = []
+    for i, values in enumerate(columns[1:]):
+        present = [value for value in values if value is not None]
+        low, high = (min(present), max(present)) if present else (math.nan, math.nan)
+        scale = scales[i] if i < len(scales) else None
+        if scale and len(present) == len(values):
+            kind, stream = _KIND_DELTA, _encode_delta(values, scale)
+        else:
+            kind, stream = _KIND_XOR, _encode_xor(values)
+        headers.append(_COLUMN_HEADER.pack(kind, low, high, len(stream)))
+        streams.append(stream)
+    payload = struct.pack("<I", len(streams[0])) + b"".join(headers) + b"".join(streams)
+    return _BLOCK_HEADER.pack(BLOCK_MAGIC, len(rows), len(payload), columns[0][0], columns[0][-1]) + payload
+
+
+class BlockInfo:
+    """Kopfdaten eines Blocks; die Nutzdaten werden erst beim Dekodieren gelesen."""
+
+    __slots__ = ("offset", "end", "count", "t_min", "t_max", "columns")
+
+    def __init__(self, buffer, offset, column_count, base=0):
+        """Liest den Kopf an `offset` in `buffer`; `base` ist die Lage von `buffer` in der Datei."""
+        magic, self.count, length, self.t_min, self.t_max = _BLOCK_HEADER.unpack_from(buffer, offset)
+        if magic != BLOCK_MAGIC:
+            raise ValueError(f"Kein Block an Position {base + offset}")
+        start = offset + _BLOCK_HEADER.size
+        ts_length = struct.unpack_from("<I", buffer, start)[0]
+        self.offset = base + offset
+        self.end = base + start + length
+        # (Kodierung, Min, Max, Position in der Datei, Länge) je Spalte, Spalte 0 = Zeitstempel
+        position = base + start + 4 + column_count * _COLUMN_HEADER.size
+        self.columns = [(None, self.t_min, self.t_max, position, ts_length)]
+        position += ts_length
+        for i in range(column_count):
+            kind, low, high, size = _COLUMN_HEADER.unpack_from(buffer, start + 4 + i * _COLUMN_HEADER.size)
+            self.columns.append((kind, low, high, position, size))
+            position += size
+
+
+def decode_block(buffer, info, indices, scales=()):
+    """Dekodiert die Spalten `indices` (0 = Zeitstempel) eines Blocks als Zeilen-Generator."""
+    streams = []
+    for index in indices:
+        kind, _, _, position, size = info.columns[index]
+        data = buffer[position:position + size]
+        if index == 0:
+            streams.append(_decode_timestamps(data, info.count))
+        elif kind == _KIND_DELTA:
+            streams.append(_decode_delta(data, info.count, scales[index - 1]))
+        else:
+            streams.append(_decode_xor(data, info.count))
+    return zip(*streams)
+
+
+class CompressedArchive:
+    """Append-only Archivdatei aus komprimierten Blöcken mit Bereichsabfragen über mmap.
+
+    Die Datei beginnt mit Spaltennamen und Quantisierung; danach folgen die
+    Blöcke in zeitlicher Reihenfolge. Beim Öffnen werden nur die Blockköpfe
+    gelesen. Ohne `columns` wird eine bestehende Datei mit ihren eigenen Spalten
+    geöffnet (z. B. ein älteres Archiv zum Lesen).
+    """
+
+    def __init__(self, path, columns=None, scales=None):
+        self.path = path
+        self.blocks = []
+        self._lock = Lock()
+        stored = self.read_header(path)
+        if stored is None:
+            if columns is None:
+                raise ValueError(f"{path}: neue Archivdatei ohne Spalten")
+            scales = scales or {}
+            header = {"columns": list(columns), "scales": [scales.get(column) for column in columns]}
+            names = json.dumps(header).encode()
+            with open(path, "wb") as file:
+                file.write(FILE_MAGIC + struct.pack("<I", len(names)) + names)
+                file.flush()
+                os.fsync(file.fileno())
+            stored = header
+        if columns is not None and tuple(columns) != tuple(stored["columns"]):
+            raise ValueError(f"{path} enthält andere Spalten: {stored['columns']}")
+        self.columns = tuple(stored["columns"])
+        self.scales = tuple(stored["scales"])
+        self._open()
+
+    @staticmethod
+    def read_header(path):
+        """Kopf einer Archivdatei ({"columns", "scales"}) oder None, wenn sie leer ist oder fehlt."""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, "rb") as file:
+            if file.read(4) != FILE_MAGIC:
+                raise ValueError(f"{path} ist keine Archivdatei")
+            length = struct.unpack("<I", file.read(4))[0]
+            return json.loads(file.read(length))
+
+    def _open(self):
+        with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            offset = 8 + struct.unpack_from("<I", buffer, 4)[0]
+            while offset + _BLOCK_HEADER.size <= len(buffer):
+                try:
+                    info = BlockInfo(buffer, offset, len(self.columns))
+                except (ValueError, struct.error):
+                    break
+                if info.end > len(buffer):
+                    break  # unvollständig geschriebener letzter Block
+                self.blocks.append(info)
+                offset = info.end
+            self._size = offset
+        if self._size < os.path.getsize(self.path):
+            # Reste eines abgebrochenen Schreibvorgangs abschneiden
+            with open(self.path, "r+b") as file:
+                file.truncate(self._size)
+
+    @property
+    def t_max(self):
+        return self.blocks[-1].t_max if self.blocks else None
+
+    def append(self, rows):
+        """Hängt Zeilen (ts, *columns), aufsteigend nach Zeit, als einen Block an."""
+        if not rows:
+            return 0
+        block = encode_block(rows, self.scales)
+        with self._lock:
+            with open(self.path, "r+b") as file:
+                file.seek(self._size)
+                file.write(block)
+                file.flush()
+                os.fsync(file.fileno())
+            self.blocks.append(BlockInfo(block, 0, len(self.columns), base=self._size))
+            self._size += len(block)
+        return len(rows)
+
+    def read(self, start, end, columns=None):
+        """Zeilen (ts, *columns) mit start <= ts < end; dekodiert nur berührte Blöcke.
+
+        Spalten, die das Archiv nicht enthält, werden als None geliefert.
+        """
+        columns = self.columns if columns is None else tuple(columns)
+        missing = [i for i, column in enumerate(columns) if column not in self.columns]
+        if missing:
+            present = [column for column in columns if column in self.columns]
+            for row in self.read(start, end, present):
+                values = iter(row[1:])
+                yield (row[0],) + tuple(None if i in missing else next(values) for i in range(len(columns)))
+            return
+        indices = [0] + [self.columns.index(column) + 1 for column in columns]
+        with self._lock:
+            blocks = [info for info in self.blocks if info.t_max >= start and info.t_min < end]
+            size = self._size
+        if not blocks:
+            return
+        with open(self.path, "rb") as file, mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as buffer:
+            for info in blocks:
+                for row in decode_block(buffer, info, indices, self.scales):
+                    if start <= row[0] < end:
+                        yield row
+
+    def summary(self, column, start=None, end=None):
+        """Anzahl, Min und Max einer Spalte allein aus den Blockköpfen (nur ganze Blöcke)."""
+        index = self.columns.index(column) + 1
+        low = -math.inf if start is None else start
+        high = math.inf if end is None else end
+        count, minimum, maximum = 0, math.inf, -math.inf
+        for info in self.blocks:
+            if info.t_min >= low and info.t_max < high:
+                _, block_min, block_max, _, _ = info.columns[index]
+                count += info.count
+                if block_min == block_min:
+                    minimum = min(minimum, block_min)
+                    maximum = max(maximum, block_max)
+        return {"count": count, "min": minimum, "max": maximum}
@@ -0,0 +1,69 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Messgrößen der Box-Steuerung für /metrics im Prometheus-Textformat. Die
+# Messpunkte nehmen Zeiten mit time.perf_counter() und übergeben nur fertige
+# Werte; Label-Kinder werden einmal erzeugt und zwischengespeichert. Damit
+# kostet eine Beobachtung wenige Mikrosekunden und die Instrumentierung kann
+# im Betrieb eingeschaltet bleiben. Prozesswerte (CPU, Speicher, Threads)
+# liefert prometheus_client selbst.
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Eine Wandlung dauert am MCP3008 mit 1,35 MHz einige zehn Mikrosekunden
+ADC_READ_SECONDS = Histogram(
+    "box_adc_read_seconds", "Dauer einer ADC-Wandlung über SPI",
+    buckets=(25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 10e-3),
+)
+WAVEFORM_CAPTURE_SECONDS = Histogram(
+    "box_waveform_capture_seconds", "Dauer einer Erfassung der Stromkurve",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+_LOOP_SECONDS = Histogram(
+    "box_loop_iteration_seconds", "Laufzeit einer Scheduler-Aufgabe", ["task"],
+    buckets=(1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+_LOOP_LAG_SECONDS = Histogram(
+    "box_loop_lag_seconds", "Verspätung einer Scheduler-Aufgabe gegenüber ihrem Termin", ["task"],
+    buckets=(1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+_LOOP_ERRORS = Counter("box_loop_errors", "Aufgaben, die mit einer Exception endeten", ["task"])
+_LOOP_OVERRUNS = Counter("box_loop_overruns", "Aufgaben, die nach ihrer Frist fertig wurden", ["task"])
+_LOOP_RESTARTS = Counter("box_loop_restarts", "Neustarts abgestürzter Aufgaben und Threads", ["task"])
+_HTTP_SECONDS = Histogram(
+    "box_http_request_seconds", "Bearbeitungszeit einer API-Anfrage", ["route", "method", "status"],
+    buckets=(5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0),
+)
+_UPLOAD_SECONDS = Histogram(
+    "box_upload_seconds", "Dauer eines Stapel-Uploads zum Gateway", ["result"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+_GPIO_TRANSITIONS = Counter("box_gpio_transitions", "Schaltflanken je GPIO-Pin", ["pin", "component"])
+
+
+class _Children:
+    """Zwischenspeicher der Label-Kinder; `labels()` sucht sonst bei jedem Aufruf unter einem Lock."""
+
+    def __init__(self, metric):
+        self.metric = metric
+        self._children = {}
+
+    def __call__(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self.metric.labels(*values)
+        return child
+
+
+loop_seconds = _Children(_LOOP_SECONDS)
+loop_lag_seconds = _Children(_LOOP_LAG_SECONDS)
+loop_errors = _Children(_LOOP_ERRORS)
+loop_overruns = _Children(_LOOP_OVERRUNS)
+loop_restarts = _Children(_LOOP_RESTARTS)
+http_seconds = _Children(_HTTP_SECONDS)
+upload_seconds = _Children(_UPLOAD_SECONDS)
+gpio_transitions = _Children(_GPIO_TRANSITIONS)
+
+
+def render():
+    """Alle Messgrößen im Textformat (Inhaltstyp CONTENT_TYPE)."""
+    return generate_latest()
@@ -1,50 +1,269 @@
-import spidev
 import time
-import RPi.GPIO as GPIO
-from datetime import datetime, time as datetime_time
-import requests
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-from threading import Thread
+from threading import Thread, Condition, Lock
+from collections import namedtuple
+import heapq
+import logging
+import itertools
+import statistics
+import numpy as np
+import os
+from zeitreihen import SensorStore, ROLLUP_PERIODS
+from energie import EnergyIntegrator, analyze_waveform
+from kalibrierung import Calibration
+from ereignisse import EventHub
+from warteschlange import UploadQueue
+from aktoren import ActuatorArbiter
+from zeitplan import CompiledSchedule
+from bewaesserung import PulseIrrigation
+from komponenten import ComponentRegistry
+from hardware import Clock, SimClock, PiBoard, SimulatedBoard
+import metriken
+from aufsicht import Supervisor
+from protokoll import DEBUG, ForwardHandler, log
+import kodierung
 
 app = Flask(__name__)
 CORS(app)
 
 #app.run(host="0.0.0.0", port=5000)
 
-GPIO.setmode(GPIO.BCM)
+COMPONENTS_FILE = os.getenv(
+    "COMPONENTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "komponenten.json")
+)
+# Relais und ADC-Kanäle der Box; alles Weitere wird daraus generisch aufgebaut
+registry = ComponentRegistry.load(COMPONENTS_FILE)
 
-PUMP_PIN = 26
-LIGHT_PIN = 16
-FAN_PIN = 13
+# "pi": echte Hardware, "sim": simulierte Box (hardware.SimulatedBoard), die mit
+# SIM_SPEED-facher Geschwindigkeit läuft; alle Zeitabfragen gehen über `clock`
+BOARD = os.getenv("BOARD", "pi")
+SIM_SPEED = float(os.getenv("SIM_SPEED", "60"))
+clock = SimClock(SIM_SPEED) if BOARD == "sim" else Clock()
+# Termine, Fristen und Neustarts aller Regelschleifen
+supervisor = Supervisor(clock)
+log.clock = clock.time
+# Jeder Messrahmen wird auf Level debug protokolliert, davon höchstens einer je Sekunde
+log.configure("Messrahmen", rate=1.0, burst=1)
+# Zugriffsprotokoll des Entwicklungsservers ebenfalls gepuffert statt synchron auf stderr
+logging.getLogger("werkzeug").addHandler(ForwardHandler(log))
+logging.getLogger("werkzeug").propagate = False
 
-GPIO.setup(PUMP_PIN,GPIO.OUT)
-GPIO.setup(FAN_PIN, GPIO.OUT)
-GPIO.setup(LIGHT_PIN, GPIO.OUT)
+# ADC-Kanäle des MCP3008
+SENSOR_CHANNELS = {name: sensor.channel for name, sensor in registry.sensors.items()}
+# Adaptive Abtastung je Kanal: Periode zwischen min_period und max_period (Sekunden).
+# Ändert sich der umgerechnete Wert um mindestens `threshold` oder schaltet ein Relais,
+# wird wieder mit min_period gemessen; sonst verdoppelt sich die Periode bis max_period.
+# Solange eine Komponente aus `active_with` läuft, bleibt der Kanal auf min_period.
+SENSOR_RATES = {
+    name: {"min_period": sensor.min_period, "max_period": sensor.max_period,
+           "threshold": sensor.threshold, "active_with": sensor.active_with}
+    for name, sensor in registry.sensors.items()
+}
+SAMPLE_BOOST_SECONDS = 30.0  # so lange wird nach einem Schaltvorgang schnell gemessen
+SAMPLE_BACKOFF = 2.0  # Faktor, um den die Periode bei ruhigem Signal wächst
+OVERSAMPLING = 8  # Wandlungen je Kanal und Messrahmen
+SAMPLE_FILTER = "median"  # "median" oder "mean"
+SENSOR_HISTORY_FRAMES = 3600  # Kapazität des Ringpuffers (eine Stunde bei 1 s Abtastung)
+SENSOR_DB = os.getenv("SENSOR_DB", "sensordaten.db")
+SENSOR_RETENTION_DAYS = 14  # ältere Rahmen wandern komprimiert ins Archiv
+SENSOR_ARCHIVE = os.getenv("SENSOR_ARCHIVE", "sensorarchiv.zra")
+# Quantisierung im Archiv: Rohwerte sind Vielfache von 1/OVERSAMPLING (Median bzw.
+# Mittelwert ganzzahliger Wandlungen), umgerechnete Werte werden auf 0,01 gerundet
+ARCHIVE_SCALES = {**{f"{name}_raw": OVERSAMPLING for name in SENSOR_CHANNELS},
+                  **{name: 100 for name in SENSOR_CHANNELS}}
+STORE_MAINTENANCE_INTERVAL = 3600  # Sekunden
+CALIBRATION_FILE = os.getenv(
+    "CALIBRATION_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "kalibrierung.json")
+)
+CALIBRATION_CHECK_INTERVAL = 10  # Sekunden zwischen zwei Prüfungen der Kalibrierdatei
+UPLOAD_URL = os.getenv("UPLOAD_URL")  # z. B. http://<gateway>:8000/ingest; ohne Angabe kein Upload
+UPLOAD_QUEUE_DB = os.getenv("UPLOAD_QUEUE_DB", "upload_warteschlange.db")
+UPLOAD_SAMPLE_INTERVAL = 10.0  # Sekunden zwischen zwei hochzuladenden Messrahmen
+UPLOAD_BATCH_INTERVAL = 60.0  # Sekunden zwischen zwei Upload-Versuchen bei leerer Warteschlange
+BOX_ID = os.getenv("BOX_ID", "box1")
+ENERGY_MAX_GAP = 5.0  # längere Messlücken werden nicht überbrückt
+WAVEFORM_INTERVAL = 1.0  # Sekunden zwischen zwei Erfassungen der Stromkurve
+WAVEFORM_SAMPLES = 600  # Wandlungen je Erfassung (mehrere Netzperioden)
+ACS712_SENSITIVITY = 0.066  # V/A (ACS712-30A)
+# Effektivstrom bei abgeschalteten Verbrauchern (Rauschen von Sensor und ADC, etwa 1 LSB), in A
+ACS712_NOISE_RMS = float(os.getenv("ACS712_NOISE_RMS", "0.077"))
+MAINS_VOLTAGE = 230.0
+MAINS_FREQUENCY = 50.0
+POWER_FACTOR = 0.9  # Schätzwert für Pumpe und Lüfter, es gibt keinen Spannungskanal
+# Gewichte für die Zuordnung der Energie
+NOMINAL_WATTS = {name: actuator.nominal_watts for name, actuator in registry.actuators.items()}
 
-spi = spidev.SpiDev()
-spi.open(0, 0)
+schedules = {name: actuator.schedule for name, actuator in registry.actuators.items()}
 
-spi.max_speed_hz = 1350000
+control_mode = {name: "automatisch" for name in registry.actuators}
 
-schedules = {
-    "light": {"start": datetime_time(6,0),"end":datetime_time(18,0)},
-    "pump": {"start":datetime_time(6,0),"end":datetime_time(18,0)},
-    "fan": {"start":datetime_time(10,0),"end":datetime_time(18,0), "interval": 30, "duration": 5},
-}
+component_status = {name: False for name in registry.actuators}
 
-control_mode = {
-    "light": "automatisch",
-    "pump": "automatisch",
-    "fan": "automatisch"
-}
 
-component_status = {
-    "light": False,
-    "pump": False,
-    "fan": False
-}
-    
+def _format_time(value):
+    if isinstance(value, str):
+        return value
+    if not hasattr(value, "strftime"):
+        # z. B. eine Zahl aus dem JSON einer Anfrage; die Routen antworten darauf mit 400
+        raise TypeError(f"Uhrzeit erwartet, nicht {type(value).__name__}")
+    return value.strftime("%H:%M")
+
+
+# Unveränderlicher Stand des Steuerzustands; jede Änderung erzeugt eine neue Version.
+# `plans` enthält die beim Setzen vorübersetzten Zeitpläne (zeitplan.CompiledSchedule).
+StateSnapshot = namedtuple("StateSnapshot", ["version", "schedules", "status", "modes", "plans"])
+
+
+class ControlState:
+    """Threadsicherer, versionierter Steuerzustand im Prozess.
+
+    Die Flask-Handler schreiben hinein, die Regelschleifen lesen direkt daraus
+    und werden bei Änderungen über Listener benachrichtigt (statt die eigene
+    HTTP-API abzufragen).
+    """
+
+    def __init__(self, schedules, status, modes):
+        self._lock = Lock()
+        self._listeners = []
+        schedules = {component: self._normalize(schedule) for component, schedule in schedules.items()}
+        self._snapshot = StateSnapshot(
+            0,
+            schedules,
+            dict(status),
+            dict(modes),
+            {component: CompiledSchedule.from_dict(schedule) for component, schedule in schedules.items()},
+        )
+
+    @staticmethod
+    def _normalize(schedule):
+        return {
+            "start": _format_time(schedule["start"]),
+            "end": _format_time(schedule["end"]),
+            "interval": schedule.get("interval", None),
+            "duration": schedule.get("duration", None),
+        }
+
+    def current(self):
+        # Lesen ohne Lock: der Snapshot wird nur als Ganzes ersetzt
+        return self._snapshot
+
+    def add_listener(self, callback):
+        """Registriert `callback(snapshot)`, das nach jeder Änderung aufgerufen wird."""
+        self._listeners.append(callback)
+
+    def _notify(self, snapshot):
+        for callback in self._listeners:
+            callback(snapshot)
+        return snapshot
+
+    def _publish(self, schedules=None, status=None, modes=None, plans=None):
+        # Aufrufer hält self._lock
+        old = self._snapshot
+        self._snapshot = StateSnapshot(
+            old.version + 1,
+            old.schedules if schedules is None else schedules,
+            old.status if status is None else status,
+            old.modes if modes is None else modes,
+            old.plans if plans is None else plans,
+        )
+        return self._snapshot
+
+    def set_schedule(self, component, start, end, interval=None, duration=None):
+        with self._lock:
+            schedules = dict(self._snapshot.schedules)
+            schedules[component] = self._normalize(
+                {"start": start, "end": end, "interval": interval, "duration": duration}
+            )
+            plans = dict(self._snapshot.plans)
+            plans[component] = CompiledSchedule.from_dict(schedules[component])
+            snapshot = self._publish(schedules=schedules, plans=plans)
+        return self._notify(snapshot)
+
+    def update(self, status=None, modes=None):
+        with self._lock:
+            snapshot = self._publish(
+                status=None if status is None else {**self._snapshot.status, **status},
+                modes=None if modes is None else {**self._snapshot.modes, **modes},
+            )
+        return self._notify(snapshot)
+
+
+state = ControlState(schedules, component_status, control_mode)
+
+
+class TimerEvent:
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """Zeitgeber-Heap, der abbrechbare Ereignisse in einem einzigen Thread ausführt.
+
+    Zeiten sind `clock.monotonic()`-Werte. Abgebrochene Ereignisse bleiben im Heap
+    liegen und werden beim Erreichen verworfen.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._cond = Condition()
+        self._counter = itertools.count()
+
+    def call_at(self, when, callback, *args):
+        event = TimerEvent(when, callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._counter), event))
+            if self._heap[0][2] is event:
+                self._cond.notify()
+        return event
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(clock.monotonic() + delay, callback, *args)
+
+    def call_soon(self, callback, *args):
+        return self.call_at(clock.monotonic(), callback, *args)
+
+    def call_every(self, interval, callback, *args):
+        """Ruft `callback` driftfrei alle `interval` Sekunden auf, beginnend sofort."""
+        def tick(when):
+            # Nächsten Termin zuerst einplanen, damit ein Fehler die Kette nicht abreißt
+            self.call_at(when + interval, tick, when + interval)
+            callback(*args)
+        tick.__name__ = getattr(callback, "__name__", "tick")
+        return self.call_soon(tick, clock.monotonic())
+
+    def _next_event(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - clock.monotonic()
+                if delay <= 0:
+                    return heapq.heappop(self._heap)[2]
+                self._cond.wait(clock.real_seconds(delay))
+
+    def _execute(self, event):
+        # Verspätung, Laufzeit und Fehler erfasst die Aufsicht; abgestürzte Ketten startet sie neu
+        supervisor.execute(event.callback, event.args, event.when, self.call_later)
+
+    def run(self):
+        while True:
+            self._execute(self._next_event())
+
+
+scheduler = Scheduler()
+
 
 #control_mode = {
  #   "light": "automatisch",
@@ -52,184 +271,683 @@ component_status = {
    # "fan": "automatisch"
 #}
 
+# Schützt den SPI-Bus, wenn Messrahmen und Strommessung gleichzeitig angefordert werden
+spi_lock = Lock()
+
+calibration = Calibration(
+    CALIBRATION_FILE,
+    required=[name for name, sensor in registry.sensors.items() if sensor.conversion == "calibration"],
+)
+
+board = SimulatedBoard(registry, calibration, clock) if BOARD == "sim" else PiBoard()
+
+for actuator in registry.actuators.values():
+    # Beim Start ausgeschaltet; Relais mit active_low schalten bei LOW
+    board.setup_output(actuator.pin, high=actuator.active_low)
+
 def read_adc(channel):
-    adc = spi.xfer2([1, (8 + channel) << 4, 0])
-    data = ((adc[1] & 3) << 8) + adc[2]
-    return data
-
-def get_soil_moisture():
-    soil_value = read_adc(0)
-    print(f"Bodenfeuchtigkeit: {soil_value}")
-    if soil_value > 650:
-        return 0
-    elif soil_value < 310:
-        return 100
-    else:
-        return ((650 - soil_value) / (650 - 310)) *100
-
-def get_water_level():
-    water_value = read_adc(1)
-    print(f"Wasserstand: {water_value}")
-    if water_value >= 670: 
-        return 100
-    elif water_value >= 660:
-        return 90
-    elif water_value >= 655:
-        return 80
-    elif water_value >= 650:
-        return 75
-    elif water_value >= 640:
-        return 70
-    elif water_value>= 625:
-        return 60
-    elif water_value >= 600:
-        return 50
-    elif water_value >= 575:
-        return 40
-    elif water_value >=550:
-        return 30
-    elif water_value >= 520:
-        return 25
-    elif water_value >= 495:
-        return 20
-    elif water_value >=460:
-        return 10
-    elif water_value < 0:
-        return 0
-    else:
-        return (water_value / 600) *100
-    
-def get_power_consumption():
-    power_value = read_adc(2)
-    print(f"Stromverbrauch: {power_value}")
-    voltage = (power_value / 1023.0) * 5
-    current_in_amps = ((voltage - 2.5) / 0.066)*-1
-    print(f"Stromverbrauch in Amper: {current_in_amps:.2f}A")
-    max_current = 5.0
-    verbrauch = voltage * current_in_amps
-    print(f"{verbrauch:.2f}W")
-    
-    return verbrauch
+    start = time.perf_counter()
+    value = board.read_adc(channel)
+    metriken.ADC_READ_SECONDS.observe(time.perf_counter() - start)
+    return value
+
+# Höchstens eine Neuberechnung der Historie zur Zeit
+_reprocessing = Lock()
 
-def fetch_current_schedule():
+def reload_calibration(reprocess=False):
+    """Übernimmt geänderte Kalibrierkurven und rechnet auf Wunsch die Historie neu.
+
+    Läuft noch eine Neuberechnung, wird keine zweite gestartet (RuntimeError).
+    """
+    if reprocess and not _reprocessing.acquire(blocking=False):
+        raise RuntimeError("Neuberechnung läuft bereits")
     try:
-        response = requests.get("http://172.20.10.2:5000/get_schedule")
-        if response.status_code == 200:
-            schedule_data = response.json()
-            return schedule_data
-        else:
-            return {}
-    except requests.exceptions.RequestException as e:
-        return {}
-    
+        sensors = calibration.reload()
+    except Exception:
+        if reprocess:
+            _reprocessing.release()
+        raise
+    if reprocess:
+        converters = {
+            sensor: (lambda raw, sensor=sensor: calibration.convert_array(sensor, raw))
+            for sensor in sensors
+            if sensor in sensor_store.fields
+        }
+
+        def recalibrate():
+            try:
+                sensor_store.recalibrate(converters)
+            finally:
+                _reprocessing.release()
+
+        Thread(target=recalibrate, daemon=True).start()
+    return sensors
 
-def fetch_manual():
+def check_calibration():
     try:
-        response = requests.get("http://172.20.10.2:5000/get_update_status")
-        if response.status_code == 200:
-            mode_data = response.json()
-            return mode_data
+        if calibration.check_reload():
+            log.info("Kalibrierung neu geladen")
+    except (OSError, ValueError, KeyError) as ex:
+        log.warning("Kalibrierung fehlerhaft, alte Kurven bleiben aktiv", error=str(ex))
+
+# Vorab belegter Puffer für die Stromkurve und letzte Auswertung
+_waveform = np.zeros(WAVEFORM_SAMPLES, dtype=np.uint16)
+latest_power = {"timestamp": None, "rms_current": 0.0, "peak_current": 0.0, "real_power": 0.0}
+
+def capture_waveform(channel):
+    """Tastet einen Kanal in einer engen Schleife in den vorab belegten Puffer ab."""
+    with spi_lock:
+        duration = board.capture(channel, _waveform)
+    metriken.WAVEFORM_CAPTURE_SECONDS.observe(duration)
+    return _waveform, duration
+
+def convert_reading(name, raw):
+    """Rechnet einen gefilterten Rohwert nach der Umrechnung des Sensors um."""
+    conversion = registry.sensors[name].conversion
+    if conversion == "power":
+        # Ein Einzelwert liegt irgendwo auf der Sinuskurve; maßgeblich ist die letzte Effektivwertmessung
+        return latest_power["real_power"]
+    if conversion == "calibration":
+        return calibration.convert(name, raw)
+    return float(raw)
+
+SensorFrame = namedtuple("SensorFrame", ["timestamp", "raw", *SENSOR_CHANNELS])
+
+class SensorSampler:
+    """Liest die Kanäle in einem Durchgang mehrfach hintereinander ein.
+
+    Die Wandlungen werden je Kanal per Median oder Mittelwert gefiltert und als
+    ein gemeinsamer, zeitgestempelter Messrahmen veröffentlicht, den alle
+    Verbraucher teilen. Nicht gelesene Kanäle behalten ihren letzten Rohwert.
+    """
+
+    def __init__(self, channels, oversampling=OVERSAMPLING, method=SAMPLE_FILTER):
+        self.channels = channels
+        self.oversampling = oversampling
+        self._filter = statistics.median if method == "median" else statistics.fmean
+        self._frame = None
+        self._listeners = []
+
+    def add_listener(self, callback, first=False):
+        """Registriert `callback(frame)`; mit `first` vor allen bisherigen (z. B. Sicherheitsprüfungen)."""
+        if first:
+            self._listeners.insert(0, callback)
         else:
-            return {}
-    except requests.exceptions.RequestException as e:
-        return {}
-    
+            self._listeners.append(callback)
+
+    def sample(self, names=None):
+        """Misst die Kanäle `names` (Standard: alle) und veröffentlicht einen neuen Rahmen."""
+        if names is None or self._frame is None:
+            names = self.channels
+        with spi_lock:
+            readings = {name: [] for name in names}
+            # Kanäle reihum abtasten, damit alle Werte aus demselben kurzen Zeitfenster stammen
+            for _ in range(self.oversampling):
+                for name in names:
+                    readings[name].append(read_adc(self.channels[name]))
+            timestamp = clock.time()
+        raw = dict(self._frame.raw) if self._frame is not None else {}
+        raw.update((name, self._filter(values)) for name, values in readings.items())
+        frame = SensorFrame(timestamp, raw, **{name: convert_reading(name, raw[name]) for name in self.channels})
+        self._frame = frame
+        for callback in self._listeners:
+            # Ein Fehler beim Speichern, Hochladen oder Veröffentlichen darf die Regelung nicht abbrechen
+            try:
+                callback(frame)
+            except Exception as ex:
+                log.error("Listener fehlgeschlagen", listener=getattr(callback, "__name__", repr(callback)),
+                          error=f"{type(ex).__name__}: {ex}")
+        return frame
+
+    def latest(self):
+        frame = self._frame
+        return frame if frame is not None else self.sample()
+
+
+sampler = SensorSampler(SENSOR_CHANNELS)
+
+
+class AdaptiveSampling:
+    """Plant die Messungen je Kanal nach dessen Signaländerung ein.
+
+    Jeder Kanal hat einen eigenen Fälligkeitstermin; fällige Kanäle werden
+    gemeinsam gelesen und der nächste Termin im Scheduler eingeplant. Bewegt sich
+    ein Wert kaum, wird seltener gemessen, bei Änderungen oder nach
+    Schaltvorgängen sofort wieder mit der kürzesten Periode.
+    """
+
+    def __init__(self, sampler, rates, boost_seconds=SAMPLE_BOOST_SECONDS, backoff=SAMPLE_BACKOFF):
+        self.sampler = sampler
+        self.rates = rates
+        self.boost_seconds = boost_seconds
+        self.backoff = backoff
+        self.periods = {name: rate["min_period"] for name, rate in rates.items()}
+        self._due = {name: 0.0 for name in rates}
+        self._fast_until = {name: 0.0 for name in rates}
+        self._last = {}  # Kanal -> zuletzt gemessener, umgerechneter Wert
+        self._event = None
+
+    def tick(self):
+        now = clock.monotonic()
+        # Kleine Toleranz, damit fast gleichzeitig fällige Kanäle in einem Durchgang gelesen werden
+        names = [name for name, due in self._due.items() if due <= now + 0.05]
+        if names:
+            frame = self.sampler.sample(names)
+            for name in names:
+                self._adapt(name, getattr(frame, name), now)
+        self._schedule()
+
+    def _adapt(self, name, value, now):
+        rate = self.rates[name]
+        last = self._last.get(name)
+        self._last[name] = value
+        fast = (
+            last is None
+            or abs(value - last) >= rate["threshold"]
+            or now < self._fast_until[name]
+            or any(relay_state.get(component) for component in rate["active_with"])
+        )
+        if fast:
+            self.periods[name] = rate["min_period"]
+        else:
+            self.periods[name] = min(self.periods[name] * self.backoff, rate["max_period"])
+        self._due[name] = now + self.periods[name]
+
+    def _schedule(self):
+        if self._event is not None:
+            self._event.cancel()
+        self._event = scheduler.call_at(min(self._due.values()), self.tick)
+
+    def boost(self):
+        """Alle Kanäle sofort und für `boost_seconds` mit der kürzesten Periode messen."""
+        now = clock.monotonic()
+        for name, rate in self.rates.items():
+            self._fast_until[name] = now + self.boost_seconds
+            self.periods[name] = rate["min_period"]
+            self._due[name] = now
+        self._schedule()
+
+
+adaptive_sampling = AdaptiveSampling(sampler, SENSOR_RATES)
+
+
+class SensorRingBuffer:
+    """Vorab belegter Ringpuffer fester Größe für Messrahmen.
+
+    Jeder Rahmen wird an Position i und i + capacity geschrieben. Dadurch liegt
+    jedes Zeitfenster zusammenhängend im Speicher und wird mit einem einzigen
+    Slice kopiert. Kopiert wird unter dem Lock, weil `append` die Zeilen
+    sonst während des Lesens überschreiben kann.
+    """
+
+    def __init__(self, capacity, fields):
+        self.fields = ("timestamp",) + tuple(fields)
+        self.capacity = capacity
+        self._data = np.zeros((2 * capacity, len(self.fields)))
+        self._count = 0  # insgesamt geschriebene Rahmen
+        self._lock = Lock()
+
+    def append(self, frame):
+        row = tuple(getattr(frame, field) for field in self.fields)
+        with self._lock:
+            index = self._count % self.capacity
+            self._data[index] = row
+            self._data[index + self.capacity] = row
+            self._count += 1
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def version(self):
+        """Anzahl der bisher geschriebenen Rahmen; ändert sich mit jedem neuen Rahmen."""
+        return self._count
+
+    def latest(self):
+        """Letzter Rahmen als Dict oder None, solange der Puffer leer ist."""
+        with self._lock:
+            if not self._count:
+                return None
+            row = self._data[(self._count - 1) % self.capacity].tolist()
+        return dict(zip(self.fields, row))
+
+    def _frames(self):
+        # Aufrufer hält self._lock; Sicht auf alle gültigen Rahmen, ältester zuerst
+        size = min(self._count, self.capacity)
+        start = (self._count - size) % self.capacity
+        return self._data[start:start + size]
+
+    def window(self):
+        """Kopie aller gültigen Rahmen, ältester zuerst."""
+        with self._lock:
+            return self._frames().copy()
+
+    def recent(self, seconds, now=None):
+        """Kopie der Rahmen der letzten `seconds` Sekunden."""
+        since = (clock.time() if now is None else now) - seconds
+        with self._lock:
+            frames = self._frames()
+            return frames[np.searchsorted(frames[:, 0], since):].copy()
+
+
+sensor_history = SensorRingBuffer(SENSOR_HISTORY_FRAMES, SENSOR_CHANNELS)
+sampler.add_listener(sensor_history.append)
+
+# Live-Datenstrom für Dashboards: Messrahmen, Zustand und Relais als Deltas
+event_hub = EventHub()
+
+def publish_frame(frame):
+    values = {name: round(getattr(frame, name), 1) for name in SENSOR_CHANNELS}
+    event_hub.update("sensors", dict(values, timestamp=round(frame.timestamp, 3)))
+
+# Listener laufen nach dem Freigeben des Zustands-Locks und können sich überholen;
+# ein älterer Snapshot als der zuletzt veröffentlichte wird verworfen
+_state_published = Lock()
+_state_version = -1
+
+def publish_state(snapshot):
+    global _state_version
+    with _state_published:
+        if snapshot.version <= _state_version:
+            return
+        _state_version = snapshot.version
+        event_hub.update("state", {
+            "status": snapshot.status,
+            "modes": snapshot.modes,
+            "schedules": snapshot.schedules,
+        })
+
+def log_frame(frame):
+    if log.enabled(DEBUG):
+        log.debug("Messrahmen", **{name: round(getattr(frame, name), 2) for name in SENSOR_CHANNELS})
+
+sampler.add_listener(publish_frame)
+sampler.add_listener(log_frame)
+state.add_listener(publish_state)
+publish_state(state.current())
+
+sensor_store = SensorStore(
+    SENSOR_DB, fields=tuple(SENSOR_CHANNELS), retention_days=SENSOR_RETENTION_DAYS,
+    archive_path=SENSOR_ARCHIVE, archive_scales=ARCHIVE_SCALES,
+)
+sampler.add_listener(sensor_store.append)
+
+def maintain_store():
+    sensor_store.flush()
+    sensor_store.apply_retention(clock.time())
+    scheduler.call_later(STORE_MAINTENANCE_INTERVAL, maintain_store)
+
+# Kanal mit Stromsensor (ACS712), dessen Kurve für Wirkleistung und Energie erfasst wird
+POWER_SENSOR = registry.sensor_with("power")
+
+energy = EnergyIntegrator(NOMINAL_WATTS, max_gap=ENERGY_MAX_GAP, sink=sensor_store.add_energy)
+
+def measure_power():
+    """Erfasst die Stromkurve, bestimmt Effektivwerte und bucht die Energie."""
+    samples, duration = capture_waveform(SENSOR_CHANNELS[POWER_SENSOR])
+    result = analyze_waveform(
+        samples, duration, ACS712_SENSITIVITY, MAINS_VOLTAGE, POWER_FACTOR, MAINS_FREQUENCY,
+        noise_rms=ACS712_NOISE_RMS,
+    )
+    result["timestamp"] = clock.time()
+    latest_power.update(result)
+    energy.add_sample(
+        result["timestamp"], result["real_power"],
+        [component for component, on in relay_state.items() if on],
+    )
+
+upload_queue = UploadQueue(UPLOAD_QUEUE_DB, UPLOAD_URL, BOX_ID) if UPLOAD_URL else None
+_last_upload_sample = 0.0
+
+def enqueue_upload(frame):
+    global _last_upload_sample
+    if frame.timestamp - _last_upload_sample < UPLOAD_SAMPLE_INTERVAL:
+        return
+    _last_upload_sample = frame.timestamp
+    upload_queue.put(dict(
+        {name: getattr(frame, name) for name in SENSOR_CHANNELS}, timestamp=frame.timestamp, raw=frame.raw,
+    ))
+
+if upload_queue is not None:
+    sampler.add_listener(enqueue_upload)
+
 def control_component(component, action):
-    global component_status
     if action == "on":
-        component_status[component] = True
-        
+        state.update(status={component: True})
     elif action == "off":
-        component_status[component] = False
+        state.update(status={component: False})
     else:
-        print("not")
+        log.warning("Unbekannte Aktion", component=component, action=action)
 
 def is_within_schedule(component):
+    plan = state.current().plans.get(component)
+    return plan is not None and plan.is_active(clock.now())
 
- #   sched = fetch_schedule_from_api()
-    
-    now = datetime.now().time()
-    sched = fetch_current_schedule()
-    
-    if component in sched:
-        start_time_str = sched[component]["start"]
-        end_time_str = sched[component]["end"]
-        print(now)
-        #print(f"zeit:{sched}")
-        start_time = datetime.strptime(start_time_str, "%H:%M").time()
-        end_time = datetime.strptime(start_time_str, "%H:%M").time()
-        if start_time <= now <= end_time:
-            return True
-        else:
-            return False
-    else:
+def write_relay(component, on):
+    actuator = registry.actuators[component]
+    board.output(actuator.pin, high=on != actuator.active_low)
+    metriken.gpio_transitions(str(actuator.pin), component).inc()
+
+# Einziger Besitzer der Relais; alle Steuerungen melden nur Wünsche an
+arbiter = ActuatorArbiter(registry.actuators, write_relay, clock=clock.time)
+
+# Tatsächlich geschaltete Relais, Grundlage für die Zuordnung der Energie
+relay_state = arbiter.state
+
+def on_relay_change(component, on, source):
+    log.info("Relais geschaltet", component=component, on=on, source=source)
+    event_hub.update("relays", relay_state)
+    adaptive_sampling.boost()
+
+arbiter.add_listener(on_relay_change)
+
+PUMP_CHECK_INTERVAL = 3  # Sekunden zwischen zwei Prüfungen von Bodenfeuchte und Wasserstand
+# "pulse": geregelte Bewässerung in kurzen Pulsen (bewaesserung.py), "fixed": fester Pumpenlauf
+IRRIGATION_MODE = os.getenv("IRRIGATION_MODE", "pulse")
+MAX_PLAN_DELAY = 60  # spätestens nach einer Minute neu planen (Korrekturen der Systemuhr)
+
+# Ausstehendes Ereignis je Komponente; wird nur im Scheduler-Thread (bzw. dem Arbeits-Thread
+# des AsyncioScheduler) verändert
+_planned = {}
+_pulse_end = {}  # Ende des festen Pumpenlaufs je Komponente im Modus "fixed"
+
+# Eine Bewässerungsregelung je Aktor mit controller "irrigation"
+irrigations = {
+    name: PulseIrrigation(
+        *actuator.irrigation.band,
+        max_cycle_seconds=actuator.irrigation.max_cycle_seconds,
+        flow_lpm=actuator.irrigation.flow_lpm,
+        clock=clock.time,
+    )
+    for name, actuator in registry.actuators.items()
+    if actuator.controller == "irrigation"
+}
+
+def _plan_next(component, delay, planner):
+    pending = _planned.get(component)
+    if pending:
+        pending.cancel()
+    _planned[component] = scheduler.call_later(min(delay, MAX_PLAN_DELAY), planner, component)
+
+def manual_override(snapshot, component):
+    """True/False bei manueller Vorgabe, None im automatischen Betrieb."""
+    status = snapshot.status.get(component)
+    if status is True:
+        return True
+    if status is None:
         return False
-        
-            
-        #return start_time <= now <= end_time
-    #else:
-        #return False
+    return None
 
-def control_device(component, action):
-    pin = {"light": LIGHT_PIN, "pump": PUMP_PIN, "fan": FAN_PIN}.get(component)
-    if action == "on":
-        GPIO.output(pin, GPIO.LOW)
+def safety_request(component, frame):
+    # False sperrt den Aktor, None überlässt die Entscheidung den anderen Quellen
+    return False if registry.interlocked(component, frame) else None
+
+def plan_schedule(component):
+    """Schaltet nach dem vorübersetzten Zeitplan; ein Lüftungszyklus ist darin eingerechnet."""
+    snapshot = state.current()
+    now = clock.now()
+    plan = snapshot.plans[component]
+    arbiter.request(
+        component,
+        safety=safety_request(component, sampler.latest()),
+        manual=manual_override(snapshot, component),
+        schedule=plan.is_active(now),
+    )
+    _plan_next(component, plan.next_transition(now), plan_schedule)
+
+def plan_irrigation(component):
+    """Bewässert im Zeitfenster nach Bodenfeuchte (Regelung oder fester Lauf).
+
+    Schlägt ein Lauf fehl, wird die Pumpe abgeschaltet, bevor die Aufsicht neu startet.
+    """
+    try:
+        _plan_irrigation(component)
+    except Exception:
+        arbiter.request(component, safety=False, schedule=False)
+        raise
+
+def _plan_irrigation(component):
+    actuator = registry.actuators[component]
+    controller = irrigations[component]
+    moisture_sensor = actuator.irrigation.sensor
+    snapshot = state.current()
+    override = manual_override(snapshot, component)
+    now = clock.monotonic()
+    if IRRIGATION_MODE == "pulse" and controller.due(now):
+        # Entscheidung nach Puls oder Sickerzeit braucht einen frischen Messwert
+        frame = sampler.sample((moisture_sensor,) + tuple(lock.sensor for lock in actuator.interlocks))
     else:
-        GPIO.output(pin, GPIO.HIGH)
-
-def check_soil_moisture(soil_value):
-    water_level = get_water_level()
-    if soil_value < 42 and water_level > 10:
-        GPIO.output(PUMP_PIN, GPIO.LOW)
-        time.sleep(270)
-        GPIO.output(PUMP_PIN, GPIO.HIGH)
+        frame = sampler.latest()
+    moisture = getattr(frame, moisture_sensor)
+    safety = safety_request(component, frame)
+    delay = PUMP_CHECK_INTERVAL
+    pulse_end = _pulse_end.get(component)
+    if IRRIGATION_MODE == "pulse":
+        allowed = safety is None and override is None and is_within_schedule(component)
+        active, remaining = controller.step(now, moisture, allowed)
+        if remaining is not None:
+            delay = min(delay, remaining)
+    elif safety is not None or override is not None:
+        # Sicherheitsabschaltung und manuelle Vorgabe brechen einen laufenden Puls ab
+        active = False
+        pulse_end = None
+    elif pulse_end is not None and now < pulse_end:
+        active = True
     else:
-        GPIO.output(PUMP_PIN, GPIO.HIGH)
+        pulse_end = None
+        active = is_within_schedule(component) and moisture < controller.low
+        if active:
+            pulse_end = now + actuator.irrigation.max_cycle_seconds
+    _pulse_end[component] = pulse_end
+    arbiter.request(component, safety=safety, manual=override, schedule=active)
+    if pulse_end is not None:
+        delay = min(delay, pulse_end - now)
+    _plan_next(component, delay, plan_irrigation)
+
+PLANNERS = {"schedule": plan_schedule, "irrigation": plan_irrigation}
+
+def check_interlocks(frame):
+    # Eine verletzte Sperre schaltet mit dem ersten Messrahmen ab, nicht erst beim nächsten Planungslauf
+    for name in registry.actuators:
+        if registry.interlocked(name, frame):
+            arbiter.request(name, safety=False)
+
+sampler.add_listener(check_interlocks, first=True)
+
+def replan():
+    for name, actuator in registry.actuators.items():
+        PLANNERS[actuator.controller](name)
+
+# Jede Änderung von Zeitplan, Status oder Modus plant sofort neu
+state.add_listener(lambda snapshot: scheduler.call_soon(replan))
+
+# Periode (längster erwarteter Abstand zweier Läufe) und Frist (Sekunden ab geplantem Start).
+# Aufgaben, die sich selbst neu einplanen, werden nach einem Absturz mit Backoff neu gestartet.
+supervisor.declare("tick", period=max(rate["max_period"] for rate in SENSOR_RATES.values()),
+                   deadline=0.5, restart=adaptive_sampling.tick)
+supervisor.declare("measure_power", period=WAVEFORM_INTERVAL, deadline=0.5)
+supervisor.declare("check_calibration", period=CALIBRATION_CHECK_INTERVAL, deadline=1.0)
+supervisor.declare("maintain_store", period=STORE_MAINTENANCE_INTERVAL, deadline=60.0, restart=maintain_store)
+supervisor.declare("plan_schedule", period=MAX_PLAN_DELAY, deadline=0.5, restart=plan_schedule)
+supervisor.declare("plan_irrigation", period=PUMP_CHECK_INTERVAL, deadline=0.5, restart=plan_irrigation)
+supervisor.declare("replan", deadline=1.0, restart=replan)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    # Nach Routenmuster statt Pfad, damit die Zahl der Zeitreihen begrenzt bleibt
+    route = request.url_rule.rule if request.url_rule is not None else "unbekannt"
+    metriken.http_seconds(route, request.method, str(response.status_code)).observe(
+        time.perf_counter() - g.request_start
+    )
+    return response
+
+# Vorab kodierte Antworten zu versionierten Daten (Steuerzustand, letzter Messrahmen)
+response_cache = kodierung.ResponseCache()
+
+def _send(etag, body, media_type):
+    headers = {"ETag": etag, "Vary": "Accept", "Cache-Control": "no-cache"}
+    if kodierung.etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=304, headers=headers)
+    return Response(body, content_type=media_type, headers=headers)
+
+def cached_response(key, version, build):
+    """Antwort aus dem Cache; `build()` läuft nur, wenn sich `version` seit der letzten Anfrage geändert hat."""
+    media_type = kodierung.negotiate(request.headers.get("Accept"))
+    return _send(*response_cache.get(key, version, build, media_type), media_type)
+
+def encoded_response(data):
+    """Antwort ohne Versionsnummer; das ETag wird aus dem kodierten Inhalt berechnet."""
+    media_type = kodierung.negotiate(request.headers.get("Accept"))
+    body = kodierung.encode(data, media_type)
+    return _send(kodierung.content_etag(body), body, media_type)
+
+def status_view():
+    snapshot = state.current()
+    return {"status": snapshot.status, "modes": snapshot.modes}
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(metriken.render(), headers={"Content-Type": metriken.CONTENT_TYPE})
 
 @app.route("/get_sensordata", methods=["GET"])
 def get_sensordata():
-    soil_moisture = get_soil_moisture()
-    water_level = get_water_level()
-    power_consumption = get_power_consumption()
+    if not len(sensor_history):
+        return jsonify({"error": "Noch keine Messwerte vorhanden"}), 503
     
-    data = {
-        "water_level": water_level,
-        "soil_moisture": soil_moisture,
-        "power_consumption": power_consumption
-        }
+    return cached_response("sensordata", sensor_history.version, sensor_history.latest)
+
+@app.route("/get_sensordata/recent", methods=["GET"])
+def get_recent_sensordata():
+    seconds = request.args.get("seconds", default=60, type=float)
+    frames = sensor_history.recent(seconds)
+    
+    # Spaltenweise ausliefern: ein Array je Messgröße
+    return encoded_response({field: frames[:, i].tolist() for i, field in enumerate(sensor_history.fields)})
+
+@app.route("/get_sensordata/history", methods=["GET"])
+def get_sensordata_history():
+    end = request.args.get("end", default=clock.time(), type=float)
+    start = request.args.get("start", default=end - 86400, type=float)
+    rows = sensor_store.query(start, end)
+    
+    columns = ("timestamp",) + sensor_store.fields
+    return encoded_response({column: [row[i] for row in rows] for i, column in enumerate(columns)})
+
+@app.route("/get_rollups", methods=["GET"])
+def get_rollups():
+    period = request.args.get("period", "day")
+    if period not in ROLLUP_PERIODS:
+        return jsonify({"error": "Ungültige Verdichtungsstufe"}), 400
+    start = request.args.get("start")
+    end = request.args.get("end")
+    
+    return encoded_response({
+        metric: sensor_store.rollups(period, metric, start, end)
+        for metric in sensor_store.fields
+    })
+
+@app.route("/reload_calibration", methods=["POST"])
+def reload_calibration_route():
+    data = request.get_json(silent=True) or {}
+    try:
+        sensors = reload_calibration(reprocess=bool(data.get("reprocess")))
+    except (OSError, ValueError, KeyError) as ex:
+        return jsonify({"error": f"Kalibrierung fehlerhaft: {ex}"}), 400
+    except RuntimeError as ex:
+        return jsonify({"error": str(ex)}), 409
     
-    return jsonify(data)
+    return jsonify({"status": "success", "sensors": sensors, "reprocess": bool(data.get("reprocess"))})
+
+@app.route("/get_power", methods=["GET"])
+def get_power():
+    return encoded_response(latest_power)
+
+@app.route("/get_irrigation", methods=["GET"])
+def get_irrigation():
+    """Zustand der Bewässerungsregelung und die letzten Zyklen mit Pumpzeit und Wasserverbrauch."""
+    return encoded_response({
+        "mode": IRRIGATION_MODE,
+        "controllers": {name: controller.snapshot() for name, controller in irrigations.items()},
+    })
+
+@app.route("/get_relays", methods=["GET"])
+def get_relays():
+    """Relaiszustände, offene Wünsche je Quelle und das Schaltprotokoll (optional ab `since`)."""
+    since = request.args.get("since", type=float)
+    return encoded_response({
+        "state": relay_state,
+        "requests": arbiter.requests(),
+        "transitions": arbiter.transitions(since),
+    })
+
+@app.route("/get_supervisor", methods=["GET"])
+def get_supervisor():
+    """Zustand, Herzschlag, Verspätung und Fristüberschreitungen je Regelschleife."""
+    return encoded_response(supervisor.status())
+
+@app.route("/get_simulation", methods=["GET"])
+def get_simulation():
+    """Modellzustand der simulierten Box (nur mit BOARD=sim)."""
+    if BOARD != "sim":
+        return jsonify({"error": "Keine Simulation aktiv"}), 404
+    return encoded_response({"speed": clock.speed, "time": clock.time(), **board.snapshot()})
+
+@app.route("/get_energy", methods=["GET"])
+def get_energy():
+    period = request.args.get("period", "day")
+    if period not in ROLLUP_PERIODS:
+        return jsonify({"error": "Ungültige Verdichtungsstufe"}), 400
+    
+    # Gesamtzähler aus den Monatssummen, damit sie Neustarts überdauern
+    totals = {
+        component: sum(bucket["wh"] for bucket in buckets)
+        for component, buckets in sensor_store.energy("month").items()
+    }
+    return encoded_response({
+        "totals_wh": totals,
+        "gap_seconds": energy.snapshot()["gap_seconds"],
+        "buckets": sensor_store.energy(period, request.args.get("start"), request.args.get("end")),
+    })
+
+@app.route("/stream", methods=["GET"])
+def stream():
+    # Server-Sent Events; Last-Event-ID erlaubt das Fortsetzen nach einem Verbindungsabbruch
+    last_seq = request.headers.get("Last-Event-ID", type=int)
+    return Response(
+        event_hub.stream(last_seq),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route("/get_manual_control", methods=["GET"])
 def get_manual_control():
-    return jsonify({
-        "status": component_status,
-        "modes": control_mode
-    })
+    return cached_response("status", state.current().version, status_view)
 
 @app.route("/get_update_status", methods=["GET"])
 def get_update_status():
-    return jsonify({
-        "status": component_status,
-        "modes": control_mode
-    })
+    return cached_response("status", state.current().version, status_view)
 
 @app.route("/set_manual_control", methods = ["GET"])
 def set_manual_control():
     data = request.json
     component = data.get("component")
     action = data.get("action")
-    mode = mode.get("mode")
+    mode = data.get("mode")
     
     if component and action:
-        control_component[component] = mode
+        control_component(component, action)
         if mode:
-            control_mode[component] = mode
+            state.update(modes={component: mode})
         
+        snapshot = state.current()
         return jsonify({
             "message": f"{component} wurde {action} und der Modus wurde auf {mode} gesetzt.",
-            "status": component_status,
-            "modes": control_mode
+            "status": snapshot.status,
+            "modes": snapshot.modes
         })
     else:
         return jsonify({"error"}), 400
@@ -237,37 +955,39 @@ def set_manual_control():
 @app.route("/set_update_status", methods=["POST"])
 def set_update_status():
     data = request.json
-    global component_status, control_mode
     
-    component_status = data.get("status", component_status)
-    control_mode = data.get("modes", control_mode)
+    state.update(status=data.get("status"), modes=data.get("modes"))
     
-    return jsonify({"success"
-    })
+    return jsonify({"status": "success"})
         
 
 @app.route("/get_action", methods=["GET"])
 def get_action():
-    schedule_data = {
-        component: {
-            "status": comp["status"]if isinstance(comp["status"],str) else print("ja")
-        }
-        for component, comp in compi.items()
-    }
-    return jsonify(schedule_data)
+    snapshot = state.current()
+    return cached_response(
+        "action", snapshot.version,
+        lambda: {component: {"status": comp} for component, comp in snapshot.status.items()},
+    )
 
 @app.route("/get_schedule", methods=["GET"])
 def get_schedule():
-    schedule_data = {
-        component: {
-            "start": schedule["start"]if isinstance(schedule["start"],str) else schedule["start"].strftime("%H:%M"),
-            "end": schedule["end"]if isinstance(schedule["end"],str) else schedule["end"].strftime("%H:%M"),
-            "interval": schedule.get("interval", None),
-            "duration": schedule.get("duration", None),
+    snapshot = state.current()
+    return cached_response("schedule", snapshot.version, lambda: snapshot.schedules)
+
+
+@app.route("/get_schedule/next", methods=["GET"])
+def get_schedule_next():
+    """Aktueller Zeitplanzustand und Zeitpunkt des nächsten Wechsels je Komponente."""
+    now = clock.now()
+    result = {}
+    for component, plan in state.current().plans.items():
+        remaining = plan.next_transition(now)
+        result[component] = {
+            "active": plan.is_active(now),
+            # Auf Sekunden gerundet: Wechsel liegen auf Minutengrenzen, das ETag bleibt bis dahin stabil
+            "next_transition": None if remaining == float("inf") else round(clock.time() + remaining),
         }
-        for component, schedule in schedules.items()
-    }
-    return jsonify(schedule_data)
+    return encoded_response(result)
 
 
 @app.route("/set_schedule", methods=["POST"])
@@ -283,11 +1003,11 @@ def set_schedule():
     if not component or not start_time or not end_time:
         return jsonify({"error": "Fehlende erforderliche Parameter"}),400#hhhhhieiier
     
-    if component in schedules:
-        schedules[component]["start"] = start_time
-        schedules[component]["end"] = end_time
-        schedules[component]["interval"] = interval_time
-        schedules[component]["duration"] = duration_time
+    if component in state.current().schedules:
+        try:
+            state.set_schedule(component, start_time, end_time, interval_time, duration_time)
+        except (ValueError, TypeError):
+            return jsonify({"error": "Ungültiger Zeitplan"}), 400
         
         #print(f"Zeitplan: {schedules}")
         
@@ -300,180 +1020,47 @@ def set_schedule():
 def set_action():
     try:
         data = request.get_json()
-        print(data)
         component = data.get("component")
         action = data.get("action")
+        log.info("set_action", component=component, action=action)
         
-        if component not in components:
+        snapshot = state.current()
+        if component not in snapshot.status:
             return jsonify ({"error": "Fehlende erforderliche Parameter"}), 400
         
-        if components[component]["mode"] != "manuell":
+        if snapshot.modes.get(component) != "manuell":
             return jsonify ({"sstatus": "error", "message": f"{component} ist nicht im manuellen Modus"}), 400
         
         if action not in ["on", "off"]:
             return jsonfiy ({"error"})
         
-        components[component]["status"] = action == "on"
+        control_component(component, action)
         
         return jsonify({"status": "success", "component": component, "action": action}), 200
     except Exception as e:
         return jsonify({"error"})
 
-def sensor_data_loop():
-    while True:
-        soil_moisture = get_soil_moisture()
-        water_level = get_water_level()
-        power_consumption = get_power_consumption()
-        
-        data = {
-            "water_level": water_level,
-            "soil_moisture": soil_moisture,
-            "power_consumption": power_consumption
-        }
-        
-        try:
-            response = requests.post("http://172.20.10.2:5000/sensordata", json=data)
-            if response.status_code !=200:
-                print("ja")
-        except Exception as ex:
-            print(ex)
-        time.sleep(200)
-
-def pump_control_loop():
-    while True:
-        now = datetime.now().strftime("%H:&M")
-        sched = fetch_current_schedule()
-        soil_moisture = get_soil_moisture()
-        water_level = get_water_level()
-        manual = fetch_manual()
-        if "status" in manual:
-            #print(manual)
-            pump_status = manual["status"]["pump"]
-            if "pump" in sched:
-                print(f"Pump:{pump_status}")
-            #print(manual)
-                pump_start = sched["pump"]["start"]
-                pump_end = sched["pump"]["end"]
-                if pump_start <= now <= pump_end:
-                    if pump_status == False:
-                        if water_level > 10:
-                            check_soil_moisture(soil_moisture)
-                        else:
-                            GPIO.output(PUMP_PIN, GPIO.HIGH)
-        time.sleep(3)
-
-def fan_control_loop():
-    while True:
-        now = datetime.now().strftime("%H:&M")
-        sched = fetch_current_schedule()
-        manual = fetch_manual()
-        if "status" in manual:
-            #print(manual)
-            fan_status = manual["status"]["fan"]
-            if "fan" in sched:
-                print(f"fan:{fan_status}")
-                fan_start = sched["fan"]["start"]
-                fan_end = sched["fan"]["end"]
-                fan_intervall = sched["fan"]["interval"]
-                fan_duration = sched["fan"]["duration"]
-                if fan_start <= now <= fan_end:
-                    if fan_status == False:
-                        print((fan_intervall)*60)
-                        time.sleep((fan_intervall)*60)
-                        GPIO.output(FAN_PIN, GPIO.LOW)
-                        print((fan_duration)*60)
-                        time.sleep((fan_duration)*60)
-                        GPIO.output(FAN_PIN, GPIO.HIGH)
-                else:
-                    GPIO.output(FAN_PIN, GPIO.HIGH)
-                
-        time.sleep(5)
-
-def light_control_loop():
-    while True:
-        now = datetime.now().strftime("%H:&M")
-        sched = fetch_current_schedule()
-        manual = fetch_manual()
-        #print(sched)
-        if "status" in manual:
-            #print(manual)
-            light_status = manual["status"]["light"]
-        if "light" in sched:
-            print(f"light:{light_status}")
-            light_start = sched["light"]["start"]
-            light_end = sched["light"]["end"]
-            if light_start <= now <= light_end:
-                if light_status == False:
-                    GPIO.output(LIGHT_PIN, GPIO.LOW)
-            else:
-                GPIO.output(LIGHT_PIN, GPIO.HIGH)
-
-        time.sleep(5)
-        
-def pump_manual_loop():
-    while True:
-        now = datetime.now().strftime("%H:&M")
-        manual = fetch_manual()
-        water_level = get_water_level()
-        if water_level > 10:
-            if "status" in manual:
-                    #print(manual)
-                pump_status = manual["status"]["pump"]
-                if pump_status == True:
-                    GPIO.output(PUMP_PIN, GPIO.LOW)             
-                elif pump_status == None:
-                    GPIO.output(PUMP_PIN, GPIO.HIGH)
-                else:
-                    print("automatisch")
-        else:
-            GPIO.output(PUMP_PIN, GPIO.HIGH)
-            
-                    
-        time.sleep(5)
-
-def fan_manual_loop():
-    while True:
-        now = datetime.now().strftime("%H:&M")
-        manual = fetch_manual()
-        #print(manual)
-        if "status" in manual:
-            #print(manual)
-            fan_status = manual["status"]["fan"]
-            if fan_status == True:
-                GPIO.output(FAN_PIN, GPIO.LOW)
-            elif fan_status == None:
-                GPIO.output(FAN_PIN, GPIO.HIGH)
-            else:
-                print("automatisch")
-        time.sleep(5)
-
-def light_manual_loop():
-    while True:
-        now = datetime.now().strftime("%H:&M")
-        manual = fetch_manual()
-        #print(manual)
-        if "status" in manual:
-            #print(manual)
-            light_status = manual["status"]["light"]
-            if light_status == True:
-                GPIO.output(LIGHT_PIN, GPIO.LOW)
-            elif light_status == None:
-                GPIO.output(LIGHT_PIN, GPIO.HIGH)
-            else:
-                print("automatisch")
-        time.sleep(5)
-                
 #app.run(host="172.20.10.2", port=5000)
+def start_jobs():
+    """Plant Abtastung, Strommessung, Wartung und Aktorsteuerung im aktuellen Scheduler ein.
+
+    Mit UPLOAD_URL startet außerdem der Upload-Thread.
+    """
+    scheduler.call_soon(adaptive_sampling.tick)
+    if POWER_SENSOR is not None:
+        scheduler.call_every(WAVEFORM_INTERVAL, measure_power)
+    scheduler.call_every(CALIBRATION_CHECK_INTERVAL, check_calibration)
+    scheduler.call_later(STORE_MAINTENANCE_INTERVAL, maintain_store)
+    scheduler.call_soon(replan)
+    if upload_queue is not None:
+        # Ohne Upload-Thread liefe die Warteschlange voll und verwürfe die ältesten Rahmen
+        supervisor.thread("upload", upload_queue.run, UPLOAD_BATCH_INTERVAL)
+
 if __name__ == "__main__":
-    Thread(target=sensor_data_loop, daemon=True).start()
-    Thread(target=pump_manual_loop, daemon=True).start()
-    Thread(target=pump_control_loop, daemon=True).start()
-    Thread(target=fan_control_loop, daemon=True).start()
-    Thread(target=light_control_loop, daemon=True).start()
-    Thread(target=fan_manual_loop, daemon=True).start()
-    Thread(target=light_manual_loop, daemon=True).start()
+    supervisor.thread("scheduler", scheduler.run)
+    start_jobs()
     
-app.run(host="172.20.10.2", port=5000)
+    app.run(host="172.20.10.2", port=5000)
 
 
 #@app.route("/set_mode", methods=["POST"])
@@ -483,15 +1070,15 @@ def set_mode():
         component = data.get("component")
         mode = data.get("mode")
         
-        if component not in components:
+        if component not in state.current().modes:
             return jsonify({"error"}),404
         if mode not in ["manuell", "automatisch"]:
             return jsonify({"error"}),400
         
-        components[component] = mode
-        
         if mode == "automatisch":
-            components[component]["status"] = False
+            state.update(status={component: False}, modes={component: mode})
+        else:
+            state.update(modes={component: mode})
         return jsonify({"status": "success", "component": component, "mode": mode}), 200
     except Exception as e:
         return jsonify({"error"}), 500
\ No newline at end of file
@@ -0,0 +1,250 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+import uvicorn
+import kodierung
+import metriken
+import projekt
+
+# Asynchrone (ASGI) Variante der Box-Steuerung: dieselben Routen wie projekt.py,
+# aber ohne Thread pro Anfrage. Abtastung, Strommessung und Aktorsteuerung laufen
+# als Tasks bzw. Timer in derselben Ereignisschleife.
+
+
+class AsyncioScheduler(projekt.Scheduler):
+    """Scheduler mit der Schnittstelle von projekt.Scheduler auf Basis der asyncio-Schleife.
+
+    Ereignisse dürfen aus beliebigen Threads eingeplant werden; die Schleife
+    übernimmt nur die Termine. Ausgeführt wird jede Aufgabe nacheinander in
+    einem eigenen Arbeits-Thread, wie im Scheduler-Thread von projekt.py: die
+    Planer verändern ihren Zustand so weiterhin nur in einem Thread, und
+    SPI-Zugriffe oder Schreiben in SQLite blockieren die Schleife nicht.
+    Ergebnisse erreichen die Schleife über die Listener (EventHub ->
+    call_soon_threadsafe).
+    """
+
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler")
+        self._tasks = []
+        self._closed = False
+
+    def call_at(self, when, callback, *args):
+        event = projekt.TimerEvent(when, callback, args)
+        # `when` ist Uhrzeit von projekt.clock; die Schleife wartet in echten Sekunden
+        delay = projekt.clock.real_seconds(when - projekt.clock.monotonic())
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, self._run, event)
+        return event
+
+    def _run(self, event):
+        if not event.cancelled and not self._closed:
+            self.executor.submit(self._execute, event)
+
+    def call_every(self, interval, callback, *args):
+        name = getattr(callback, "__name__", "callback")
+        supervisor = projekt.supervisor
+
+        def run_once(when):
+            run = supervisor.begin(name, when)
+            try:
+                callback(*args)
+            except Exception as ex:
+                supervisor.end(run, ex)
+            else:
+                supervisor.end(run)
+
+        async def periodic():
+            clock = projekt.clock
+            when = clock.monotonic()
+            while True:
+                await self.loop.run_in_executor(self.executor, run_once, when)
+                when += interval
+                await asyncio.sleep(max(0.0, clock.real_seconds(when - clock.monotonic())))
+        task = self.loop.create_task(periodic())
+        self._tasks.append(task)
+        return task
+
+    def close(self):
+        """Beendet periodische Aufgaben und wartet auf die laufende Aufgabe."""
+        self._closed = True
+        for task in self._tasks:
+            task.cancel()
+        self.executor.shutdown(cancel_futures=True)
+
+    def run(self):
+        raise RuntimeError("AsyncioScheduler läuft in der asyncio-Schleife")
+
+
+class AsyncSubscribers:
+    """Weckt SSE-Abonnenten in der Schleife, sobald der EventHub ein Ereignis veröffentlicht."""
+
+    def __init__(self, hub, loop):
+        self.hub = hub
+        self.loop = loop
+        self._changed = asyncio.Event()
+        hub.add_waiter(lambda: loop.call_soon_threadsafe(self._notify))
+
+    def _notify(self):
+        # Alle Wartenden teilen sich ein Event; es wird ausgelöst und durch ein neues ersetzt
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def stream(self, last_seq=None, keepalive=15.0):
+        events = None
+        if last_seq is not None:
+            events, new_seq = self.hub.events_since(last_seq)
+            if events is not None:
+                last_seq = new_seq
+        while True:
+            if events is None:
+                last_seq, view = self.hub.snapshot()
+                yield self.hub.encode(last_seq, "snapshot", view)
+            else:
+                for payload in events:
+                    yield payload
+            changed = self._changed
+            events, new_seq = self.hub.events_since(last_seq)
+            if events == []:
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                events, new_seq = self.hub.events_since(last_seq)
+            if events is not None:
+                last_seq = new_seq
+
+
+class RequestTiming:
+    """ASGI-Middleware: Bearbeitungszeit je Route bis zum Beginn der Antwort."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                # Routenmuster statt Pfad, damit die Zahl der Zeitreihen begrenzt bleibt
+                route = scope.get("route")
+                metriken.http_seconds(
+                    route.path if route is not None else "unbekannt", scope["method"], str(message["status"])
+                ).observe(time.perf_counter() - start)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+
+subscribers = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global subscribers
+    loop = asyncio.get_running_loop()
+    projekt.scheduler = AsyncioScheduler(loop)
+    subscribers = AsyncSubscribers(projekt.event_hub, loop)
+    projekt.start_jobs()
+    yield
+    projekt.scheduler.close()
+    projekt.sensor_store.flush()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(RequestTiming)
+
+
+def send(request, etag, body, media_type):
+    headers = {"ETag": etag, "Vary": "Accept", "Cache-Control": "no-cache"}
+    if kodierung.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def cached_response(request, key, version, build):
+    """Wie projekt.cached_response; der Cache wird mit der Flask-Variante geteilt."""
+    media_type = kodierung.negotiate(request.headers.get("accept"))
+    return send(request, *projekt.response_cache.get(key, version, build, media_type), media_type)
+
+
+def encoded_response(request, data):
+    media_type = kodierung.negotiate(request.headers.get("accept"))
+    body = kodierung.encode(data, media_type)
+    return send(request, kodierung.content_etag(body), body, media_type)
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(metriken.render(), headers={"Content-Type": metriken.CONTENT_TYPE})
+
+
+@app.get("/get_sensordata")
+async def get_sensordata(request: Request):
+    history = projekt.sensor_history
+    if not len(history):
+        return ORJSONResponse({"error": "Noch keine Messwerte vorhanden"}, status_code=503)
+    return cached_response(request, "sensordata", history.version, history.latest)
+
+
+@app.get("/get_supervisor")
+async def get_supervisor(request: Request):
+    return encoded_response(request, projekt.supervisor.status())
+
+
+@app.get("/get_schedule")
+async def get_schedule(request: Request):
+    snapshot = projekt.state.current()
+    return cached_response(request, "schedule", snapshot.version, lambda: snapshot.schedules)
+
+
+@app.post("/set_schedule")
+async def set_schedule(request: Request):
+    data = await request.json()
+
+    component = data.get("component")
+    start_time = data.get("start")
+    end_time = data.get("end")
+
+    if not component or not start_time or not end_time:
+        return ORJSONResponse({"error": "Fehlende erforderliche Parameter"}, status_code=400)
+
+    if component not in projekt.state.current().schedules:
+        return ORJSONResponse({"error": "Ungültige Komponente"}, status_code=400)
+
+    try:
+        projekt.state.set_schedule(component, start_time, end_time, data.get("interval"), data.get("duration"))
+    except (ValueError, TypeError):
+        return ORJSONResponse({"error": "Ungültiger Zeitplan"}, status_code=400)
+    return {"message": f"Zeitplan für {component} aktualisiert."}
+
+
+@app.get("/get_update_status")
+async def get_update_status(request: Request):
+    return cached_response(request, "status", projekt.state.current().version, projekt.status_view)
+
+
+@app.post("/set_update_status")
+async def set_update_status(request: Request):
+    data = await request.json()
+    projekt.state.update(status=data.get("status"), modes=data.get("modes"))
+    return {"status": "success"}
+
+
+@app.get("/stream")
+async def stream(request: Request):
+    last_seq = request.headers.get("Last-Event-ID")
+    return StreamingResponse(
+        subscribers.stream(int(last_seq) if last_seq else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="172.20.10.2", port=5000)
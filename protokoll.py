@@ -0,0 +1,185 @@
+import atexit
+import logging
+import os
+import random
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from threading import Event, Thread
+import orjson
+
+# Strukturiertes Protokoll für die Regelschleifen. Ein Aufruf prüft nur Level,
+# Ratenbegrenzung und Stichprobe und hängt ein Tupel an eine deque an
+# (append/popleft sind in CPython ohne Lock threadsicher); Formatieren und
+# Schreiben übernimmt ein Hintergrund-Thread. Langsame Ausgaben (journald,
+# serielle Konsole) bremsen dadurch keine Schleife mehr.
+#
+#   log.info("Kalibrierung neu geladen", sensors=3)
+#   -> ts=2026-10-18T12:00:00.123 level=info msg="Kalibrierung neu geladen" sensors=3
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+
+def _logfmt_value(value):
+    text = value if isinstance(value, str) else str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+    return text
+
+
+def format_logfmt(timestamp, level, message, fields):
+    ts = datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds")
+    parts = [f"ts={ts}", f"level={LEVEL_NAMES[level]}", f"msg={_logfmt_value(message)}"]
+    parts += [f"{key}={_logfmt_value(value)}" for key, value in fields.items()]
+    return " ".join(parts)
+
+
+def format_json(timestamp, level, message, fields):
+    record = {"ts": round(timestamp, 3), "level": LEVEL_NAMES[level], "msg": message, **fields}
+    return orjson.dumps(record, default=str).decode()
+
+
+class Logger:
+    """Gepuffertes Protokoll mit Level, Ratenbegrenzung und Stichproben je Meldung.
+
+    Je Meldungstext (ohne Felder) dürfen höchstens `rate` Einträge pro Sekunde mit
+    einem Vorrat von `burst` durch; unterdrückte Einträge werden beim nächsten
+    durchgelassenen als `suppressed=n` mitgezählt. `sample` (0..1, je Aufruf
+    oder über `configure` je Meldung) lässt nur einen Anteil zufällig durch.
+    Fehler werden sofort geschrieben, alles andere spätestens nach
+    `flush_interval` Sekunden. Ist der Puffer voll, werden neue Einträge
+    verworfen und in `dropped` gezählt.
+    """
+
+    def __init__(self, level=INFO, stream=None, formatter=format_logfmt, clock=time.time,
+                 rate=10.0, burst=20, capacity=10000, flush_interval=0.5):
+        self.level = LEVELS.get(level, level) if isinstance(level, str) else level
+        self.stream = stream
+        self.formatter = formatter
+        self.clock = clock
+        self.rate = rate
+        self.burst = burst
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._limits = {}  # Meldung -> (rate, burst, sample)
+        self._buckets = {}  # Meldung -> [Vorrat, letzte Auffüllung, unterdrückt]
+        self._queue = deque()
+        self._wake = Event()
+        self._writer = None
+
+    def configure(self, message, rate=None, burst=None, sample=1.0):
+        """Eigene Ratenbegrenzung bzw. Stichprobe für eine Meldung (None = Standard)."""
+        self._limits[message] = (
+            self.rate if rate is None else rate, self.burst if burst is None else burst, sample,
+        )
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def _admit(self, message, sample):
+        # Ohne Lock: ein Wettlauf verfälscht höchstens einen Zähler um eins
+        rate, burst, configured = self._limits.get(message, (self.rate, self.burst, 1.0))
+        sample = configured if sample is None else sample
+        if sample < 1.0 and random.random() >= sample:
+            return None
+        now = time.monotonic()
+        bucket = self._buckets.get(message)
+        if bucket is None:
+            bucket = self._buckets[message] = [float(burst), now, 0]
+        bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            bucket[2] += 1
+            return None
+        bucket[0] -= 1.0
+        suppressed, bucket[2] = bucket[2], 0
+        return suppressed
+
+    def log(self, level, message, sample=None, **fields):
+        if level < self.level:
+            return
+        suppressed = self._admit(message, sample)
+        if suppressed is None:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed
+        if len(self._queue) >= self.capacity:
+            self.dropped += 1
+            return
+        self._queue.append((self.clock(), level, message, fields))
+        if self._writer is None:
+            self._start()
+        if level >= ERROR:
+            self._wake.set()
+
+    def debug(self, message, sample=None, **fields):
+        self.log(DEBUG, message, sample, **fields)
+
+    def info(self, message, sample=None, **fields):
+        self.log(INFO, message, sample, **fields)
+
+    def warning(self, message, sample=None, **fields):
+        self.log(WARNING, message, sample, **fields)
+
+    def error(self, message, sample=None, **fields):
+        self.log(ERROR, message, sample, **fields)
+
+    def _start(self):
+        # Mehrfachstart im Wettlauf ist unschädlich: jeder Schreiber leert dieselbe deque
+        self._writer = Thread(target=self._run, name="protokoll", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Schreibt alle gepufferten Einträge."""
+        lines = []
+        queue = self._queue
+        while True:
+            try:
+                entry = queue.popleft()
+            except IndexError:
+                break
+            lines.append(self.formatter(*entry))
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            lines.append(self.formatter(self.clock(), WARNING, "Protokollpuffer voll", {"dropped": dropped}))
+        if not lines:
+            return
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+
+
+class ForwardHandler(logging.Handler):
+    """Leitet Einträge des logging-Moduls (z. B. das Zugriffsprotokoll von werkzeug) in einen Logger.
+
+    Meldungstext ist der Name des Loggers, damit die Ratenbegrenzung für alle
+    Zeilen einer Quelle gemeinsam gilt; die Zeile selbst steht im Feld `line`.
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def emit(self, record):
+        level = min(ERROR, max(DEBUG, record.levelno // 10 * 10))
+        self.target.log(level, record.name, line=record.getMessage())
+
+
+log = Logger(
+    level=os.getenv("LOG_LEVEL", "info"),
+    formatter=format_json if os.getenv("LOG_FORMAT") == "json" else format_logfmt,
+)
@@ -0,0 +1,18 @@
+import os
+import requests
+
+# Zugriff der Streamlit-Seiten auf die API der Box-Steuerung (projekt.py)
+
+def box_url():
+    # Erst beim Aufruf lesen, damit Werte aus der .env (load_dotenv in main.py) greifen
+    return os.getenv("BOX_URL", "http://172.20.10.2:5000")
+
+def get_json(path, **params):
+    """Fragt einen Endpunkt der Box ab; liefert None, wenn sie nicht erreichbar ist."""
+    try:
+        response = requests.get(f"{box_url()}{path}", params=params, timeout=5)
+        if response.status_code == 200:
+            return response.json()
+    except requests.exceptions.RequestException:
+        pass
+    return None
@@ -0,0 +1,117 @@
+import gzip
+import random
+import sqlite3
+import time
+from threading import Lock
+import orjson
+import requests
+import metriken
+from protokoll import log
+
+# Dauerhafte Ausgangswarteschlange für Messrahmen. Rahmen werden lokal in SQLite
+# angehängt und gebündelt, gzip-komprimiert hochgeladen, sobald das Ziel
+# erreichbar ist. Jede Zeile hat eine fortlaufende Nummer; das Ziel verwirft
+# bereits bekannte Nummern, dadurch sind Wiederholungen unschädlich.
+
+
+class UploadQueue:
+    """Store-and-forward-Warteschlange mit Stapel-Upload und exponentiellem Backoff."""
+
+    def __init__(self, path, url, box_id, batch_size=500, max_rows=500000, timeout=10.0,
+                 min_backoff=5.0, max_backoff=900.0):
+        self.url = url
+        self.box_id = box_id
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.dropped = 0
+        self.failures = 0
+        self.session = requests.Session()
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # AUTOINCREMENT: Nummern werden auch nach dem Löschen nie wiederverwendet
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, payload BLOB)"
+        )
+        # Zeilenzahl einmal beim Start zählen, danach im Speicher mitführen
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def put(self, record):
+        """Hängt einen Datensatz an; ist die Warteschlange voll, fallen die ältesten heraus."""
+        with self._lock:
+            self._conn.execute("INSERT INTO outbox (payload) VALUES (?)", (orjson.dumps(record),))
+            self._rows += 1
+            overflow = self._rows - self.max_rows
+            if overflow > 0:
+                deleted = self._conn.execute(
+                    "DELETE FROM outbox WHERE seq IN (SELECT seq FROM outbox ORDER BY seq LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+                self._rows -= deleted
+                self.dropped += deleted
+
+    def __len__(self):
+        return self._rows
+
+    def _next_batch(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, payload FROM outbox ORDER BY seq LIMIT ?", (self.batch_size,)
+            ).fetchall()
+
+    def upload_once(self):
+        """Lädt den nächsten Stapel hoch; liefert die Anzahl bestätigter Datensätze.
+
+        Netzwerk- und Serverfehler werden als Exception weitergereicht, der Stapel bleibt erhalten.
+        """
+        rows = self._next_batch()
+        if not rows:
+            return 0
+        first_seq, last_seq = rows[0][0], rows[-1][0]
+        # Die Rahmen liegen bereits als JSON vor und werden ohne erneutes Parsen eingebettet
+        body = b'{"box":%s,"first_seq":%d,"last_seq":%d,"frames":[%s]}' % (
+            orjson.dumps(self.box_id), first_seq, last_seq,
+            b",".join(b'{"seq":%d,"frame":%s}' % (seq, payload) for seq, payload in rows),
+        )
+        start = time.perf_counter()
+        result = "fehler"
+        try:
+            response = self.session.post(
+                self.url,
+                data=gzip.compress(body),
+                headers={
+                    "Content-Type": "application/json",
+                    "Content-Encoding": "gzip",
+                    "Idempotency-Key": f"{self.box_id}:{first_seq}-{last_seq}",
+                },
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            result = "ok"
+        finally:
+            metriken.upload_seconds(result).observe(time.perf_counter() - start)
+        with self._lock:
+            self._rows -= self._conn.execute("DELETE FROM outbox WHERE seq <= ?", (last_seq,)).rowcount
+        return len(rows)
+
+    def run(self, interval=60.0):
+        """Upload-Schleife: volle Stapel direkt nacheinander, bei Fehlern mit wachsender Pause."""
+        backoff = self.min_backoff
+        while True:
+            try:
+                sent = self.upload_once()
+            except requests.exceptions.RequestException as ex:
+                self.failures += 1
+                # Zufälliger Anteil, damit viele Boxen nach einem Ausfall nicht gleichzeitig senden
+                delay = backoff * random.uniform(0.5, 1.0)
+                log.warning("Upload fehlgeschlagen", waiting=len(self), retry_in=round(delay), error=str(ex))
+                time.sleep(delay)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.min_backoff
+            if sent < self.batch_size:
+                time.sleep(interval)
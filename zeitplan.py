@@ -0,0 +1,64 @@
+import math
+from array import array
+
+# Vorübersetzte Zeitpläne: ein Zeitplan ("start", "end", optional Lüftungszyklus
+# "interval"/"duration" in Minuten) wird einmal beim Setzen in eine Tabelle
+# über alle 1440 Minuten des Tages übersetzt. Abfragen sind danach ein
+# Tabellenzugriff statt Parsen und Rechnen bei jedem Aufruf.
+
+MINUTES_PER_DAY = 1440
+
+
+def minute_of_day(hhmm):
+    hours, minutes = map(int, hhmm.split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Ungültige Uhrzeit: {hhmm}")
+    return hours * 60 + minutes
+
+
+class CompiledSchedule:
+    """Minutentabelle eines Zeitplans mit Abstand zum nächsten Zustandswechsel je Minute.
+
+    Fenster über Mitternacht (z. B. 22:00-06:00) werden unterstützt; ist
+    start == end, ist das Fenster leer. Mit `interval` und `duration` wird
+    innerhalb des Fensters ab Fensterbeginn zyklisch `interval` Minuten pausiert
+    und `duration` Minuten eingeschaltet.
+    """
+
+    __slots__ = ("active", "_until_change")
+
+    def __init__(self, start, end, interval=None, duration=None):
+        first = minute_of_day(start)
+        length = (minute_of_day(end) - first) % MINUTES_PER_DAY
+        active = bytearray(MINUTES_PER_DAY)
+        if (interval or 0) < 0 or (duration or 0) < 0:
+            raise ValueError("Intervall und Dauer dürfen nicht negativ sein")
+        cycle = interval + duration if interval and duration else None
+        for offset in range(length):
+            if cycle is None or offset % cycle >= interval:
+                active[(first + offset) % MINUTES_PER_DAY] = 1
+        self.active = bytes(active)
+        self._until_change = None
+        if 0 < sum(active) < MINUTES_PER_DAY:
+            # Rückwärts über zwei Tage: jede Minute des ersten Tages sieht ihren nächsten Wechsel
+            until = [0] * (2 * MINUTES_PER_DAY)
+            for minute in range(2 * MINUTES_PER_DAY - 2, -1, -1):
+                current = active[minute % MINUTES_PER_DAY]
+                following = active[(minute + 1) % MINUTES_PER_DAY]
+                until[minute] = 1 if current != following else until[minute + 1] + 1
+            self._until_change = array("H", until[:MINUTES_PER_DAY])
+
+    @classmethod
+    def from_dict(cls, schedule):
+        return cls(schedule["start"], schedule["end"], schedule.get("interval"), schedule.get("duration"))
+
+    def is_active(self, now):
+        """Zustand zum Zeitpunkt `now` (datetime, lokale Zeit)."""
+        return bool(self.active[now.hour * 60 + now.minute])
+
+    def next_transition(self, now):
+        """Sekunden bis zum nächsten Zustandswechsel; math.inf, wenn sich nie etwas ändert."""
+        if self._until_change is None:
+            return math.inf
+        minute = now.hour * 60 + now.minute
+        return self._until_change[minute] * 60 - now.second - now.microsecond / 1e6
@@ -0,0 +1,436 @@
+import glob
+import os
+import sqlite3
+import time
+from threading import Lock
+from kompression import CompressedArchive
+
+# Lokaler Zeitreihenspeicher für Messrahmen (SQLite im WAL-Modus).
+# Auf der SD-Karte wird gebündelt geschrieben: Messrahmen werden im Speicher
+# gesammelt und in einer Transaktion abgelegt; mit synchronous=NORMAL wird im
+# WAL-Modus nur beim Checkpoint ein fsync ausgeführt.
+
+DEFAULT_FIELDS = ("soil_moisture", "water_level", "power_consumption")
+ARCHIVE_BLOCK_ROWS = 4096  # Zeilen je komprimiertem Archivblock
+
+# Verdichtungsstufen (lokale Zeit); die Formate sortieren lexikalisch wie zeitlich
+ROLLUP_PERIODS = {"hour": "%Y-%m-%d %H", "day": "%Y-%m-%d", "month": "%Y-%m"}
+
+
+def _merge(target, key, acc):
+    # acc = [count, sum, min, max]
+    current = target.get(key)
+    if current is None:
+        target[key] = list(acc)
+    else:
+        current[0] += acc[0]
+        current[1] += acc[1]
+        current[2] = min(current[2], acc[2])
+        current[3] = max(current[3], acc[3])
+
+
+class SensorStore:
+    """Append-only Speicher für Messrahmen mit Zeitbereichsabfragen und Aufbewahrungsfrist.
+
+    Mit `archive_path` werden Rahmen, die aus der Aufbewahrungsfrist fallen, nicht
+    gelöscht, sondern komprimiert in eine Archivdatei verschoben; `query()` liest
+    dann transparent aus beiden Quellen. `archive_scales` legt je Spalte die
+    Quantisierung fest (siehe kompression.encode_block).
+    """
+
+    def __init__(self, path, fields=DEFAULT_FIELDS, batch_size=60, flush_interval=60.0,
+                 retention_days=90, archive_path=None, archive_scales=None):
+        self.fields = tuple(fields)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._pending = []
+        self._pending_rollups = {}
+        self._pending_energy = {}
+        self._last_flush = time.monotonic()
+        self._lock = Lock()
+        self._recalibrating = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # auto_vacuum muss vor dem Anlegen der ersten Tabelle gesetzt sein
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA journal_size_limit=4194304")
+        self._conn.execute("PRAGMA wal_autocheckpoint=1000")
+        self._create_schema()
+        self.archive = None
+        self._old_archives = []  # frühere Archivdateien mit anderen Spalten, nur lesend
+        if archive_path is not None:
+            header = CompressedArchive.read_header(archive_path)
+            if header is not None and tuple(header["columns"]) != self.columns:
+                # Die Sensoren haben sich geändert: die alte Datei bleibt lesbar, neu wird weitergeschrieben
+                os.replace(archive_path, f"{archive_path}.{int(time.time())}")
+            self._old_archives = [
+                CompressedArchive(old) for old in sorted(glob.glob(f"{glob.escape(archive_path)}.*"))
+            ]
+            self.archive = CompressedArchive(archive_path, self.columns, archive_scales)
+
+    def _create_schema(self):
+        # Der Zeitstempel ist Primärschlüssel einer WITHOUT-ROWID-Tabelle: die Zeilen
+        # liegen nach Zeit sortiert, Bereichsabfragen brauchen keinen Zusatzindex.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS readings (ts REAL PRIMARY KEY) WITHOUT ROWID")
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(readings)")}
+        for column in self.columns:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE readings ADD COLUMN {column} REAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rollups ("
+            " period TEXT, bucket TEXT, metric TEXT,"
+            " count INTEGER, sum REAL, min REAL, max REAL,"
+            " PRIMARY KEY (period, bucket, metric)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS energy ("
+            " period TEXT, bucket TEXT, component TEXT, wh REAL,"
+            " PRIMARY KEY (period, bucket, component)) WITHOUT ROWID"
+        )
+
+    @property
+    def columns(self):
+        return tuple(f"{field}_raw" for field in self.fields) + self.fields
+
+    def _row(self, frame):
+        return (
+            (frame.timestamp,)
+            + tuple(frame.raw.get(field) for field in self.fields)
+            + tuple(getattr(frame, field, None) for field in self.fields)
+        )
+
+    def _accumulate(self, row):
+        # Aufrufer hält self._lock
+        local = time.localtime(row[0])
+        buckets = [(period, time.strftime(fmt, local)) for period, fmt in ROLLUP_PERIODS.items()]
+        for field, value in zip(self.fields, row[1 + len(self.fields):]):
+            if value is None:
+                continue
+            for period, bucket in buckets:
+                _merge(self._pending_rollups, (period, bucket, field), (1, value, value, value))
+
+    def append(self, frame):
+        """Merkt einen Messrahmen vor und schreibt gebündelt, sobald der Puffer voll ist.
+
+        Die Stunden-, Tages- und Monatsaggregate werden dabei fortlaufend nachgeführt.
+        """
+        row = self._row(frame)
+        with self._lock:
+            self._pending.append(row)
+            self._accumulate(row)
+            due = (len(self._pending) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def add_energy(self, timestamp, component, wh):
+        """Bucht Energie (Wh) auf die Stunden-, Tages- und Monatszähler einer Komponente."""
+        local = time.localtime(timestamp)
+        with self._lock:
+            for period, fmt in ROLLUP_PERIODS.items():
+                key = (period, time.strftime(fmt, local), component)
+                self._pending_energy[key] = self._pending_energy.get(key, 0.0) + wh
+
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+            rollups, self._pending_rollups = self._pending_rollups, {}
+            energy, self._pending_energy = self._pending_energy, {}
+            self._last_flush = time.monotonic()
+            if not rows and not energy:
+                return 0
+            placeholders = ", ".join("?" * (len(self.columns) + 1))
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO readings (ts, {', '.join(self.columns)}) VALUES ({placeholders})",
+                    rows,
+                )
+                self._conn.executemany(
+                    "INSERT INTO rollups (period, bucket, metric, count, sum, min, max)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (period, bucket, metric) DO UPDATE SET"
+                    " count = count + excluded.count, sum = sum + excluded.sum,"
+                    " min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+                    [key + tuple(acc) for key, acc in rollups.items()],
+                )
+                self._conn.executemany(
+                    "INSERT INTO energy (period, bucket, component, wh) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (period, bucket, component) DO UPDATE SET wh = wh + excluded.wh",
+                    [key + (wh,) for key, wh in energy.items()],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                self._pending[:0] = rows
+                for key, acc in rollups.items():
+                    _merge(self._pending_rollups, key, acc)
+                for key, wh in energy.items():
+                    self._pending_energy[key] = self._pending_energy.get(key, 0.0) + wh
+                raise
+        return len(rows)
+
+    def query(self, start, end, fields=None):
+        """Liefert Zeilen (ts, *fields) mit start <= ts < end, aufsteigend nach Zeit.
+
+        Noch nicht geschriebene Rahmen werden mit ausgeliefert.
+        """
+        fields = self.fields if fields is None else tuple(fields)
+        indices = [self.columns.index(field) + 1 for field in fields]
+        rows = []
+        archives = self._old_archives + ([self.archive] if self.archive is not None else [])
+        archived = max((archive.t_max for archive in archives if archive.t_max is not None), default=None)
+        if archived is not None and start <= archived:
+            for archive in archives:
+                rows += archive.read(start, end, fields)
+            # Was bereits im Archiv liegt, wird aus der Datenbank nicht noch einmal gelesen
+            start = max(start, archived + 1e-6)
+        with self._lock:
+            rows += self._conn.execute(
+                f"SELECT ts, {', '.join(fields)} FROM readings WHERE ts >= ? AND ts < ? ORDER BY ts",
+                (start, end),
+            ).fetchall()
+            rows += [
+                (row[0],) + tuple(row[i] for i in indices)
+                for row in self._pending
+                if start <= row[0] < end
+            ]
+        return rows
+
+    def rollups(self, period, metric, start=None, end=None):
+        """Vorberechnete Aggregate einer Stufe aus ROLLUP_PERIODS, aufsteigend nach Bucket.
+
+        `start` und `end` sind Bucket-Schlüssel im Format der Stufe (inklusive).
+        """
+        low = "" if start is None else start
+        high = "\uffff" if end is None else end
+        with self._lock:
+            merged = {
+                bucket: [count, total, minimum, maximum]
+                for bucket, count, total, minimum, maximum in self._conn.execute(
+                    "SELECT bucket, count, sum, min, max FROM rollups"
+                    " WHERE period = ? AND metric = ? AND bucket BETWEEN ? AND ?",
+                    (period, metric, low, high),
+                )
+            }
+            for (p, bucket, m), acc in self._pending_rollups.items():
+                if p == period and m == metric and low <= bucket <= high:
+                    _merge(merged, bucket, acc)
+        return [
+            {"bucket": bucket, "count": count, "sum": total, "min": minimum, "max": maximum,
+             "mean": total / count}
+            for bucket, (count, total, minimum, maximum) in sorted(merged.items())
+        ]
+
+    def energy(self, period, start=None, end=None):
+        """Energiezähler einer Stufe als {Komponente: [{"bucket", "wh"}, ...]}."""
+        low = "" if start is None else start
+        high = "\uffff" if end is None else end
+        with self._lock:
+            merged = {
+                (bucket, component): wh
+                for bucket, component, wh in self._conn.execute(
+                    "SELECT bucket, component, wh FROM energy"
+                    " WHERE period = ? AND bucket BETWEEN ? AND ?",
+                    (period, low, high),
+                )
+            }
+            for (p, bucket, component), wh in self._pending_energy.items():
+                if p == period and low <= bucket <= high:
+                    merged[(bucket, component)] = merged.get((bucket, component), 0.0) + wh
+        result = {}
+        for (bucket, component), wh in sorted(merged.items()):
+            result.setdefault(component, []).append({"bucket": bucket, "wh": wh})
+        return result
+
+    def recalibrate(self, converters, chunk_size=10000):
+        """Berechnet abgeleitete Spalten aus den gespeicherten Rohwerten neu.
+
+        `converters` bildet Feldnamen auf Funktionen ab, die eine Folge von
+        Rohwerten in ein Array umgerechneter Werte umwandeln. Jeder Abschnitt von
+        `chunk_size` Zeilen wird in einer eigenen kurzen Transaktion geschrieben,
+        dazwischen wird der Lock freigegeben, damit `append` und `flush` nie
+        länger als einen Abschnitt warten. Die Aggregate werden um die Differenz
+        je Zeile nachgeführt; Buckets, die ganz im noch gespeicherten Zeitraum
+        liegen, werden danach exakt neu aufgebaut. Ältere Buckets, deren Rohwerte
+        schon gelöscht oder archiviert sind, bleiben unverändert. Gleichzeitige
+        Aufrufe laufen nacheinander, sonst verschöben beide dieselben Summen.
+        """
+        with self._recalibrating:
+            return self._recalibrate(converters, chunk_size)
+
+    def _recalibrate(self, converters, chunk_size):
+        self.flush()
+        updated = 0
+        for field, convert in converters.items():
+            last = float("-inf")
+            while True:
+                with self._lock:
+                    rows = self._conn.execute(
+                        f"SELECT ts, {field}_raw, {field} FROM readings"
+                        f" WHERE ts > ? AND {field}_raw IS NOT NULL ORDER BY ts LIMIT ?",
+                        (last, chunk_size),
+                    ).fetchall()
+                if not rows:
+                    break
+                # Umrechnen ohne Lock
+                values = [float(value) for value in convert([raw for _, raw, _ in rows])]
+                changed = [
+                    (ts, old, new) for (ts, _, old), new in zip(rows, values)
+                    if old is not None and new == new and new != old
+                ]
+                if changed:
+                    self._apply_recalibrated(field, changed)
+                updated += len(rows)
+                last = rows[-1][0]
+            self._rebuild_retained_rollups(field)
+        return updated
+
+    def _apply_recalibrated(self, field, changed):
+        """Schreibt neue Werte (ts, alt, neu) und verschiebt die Summen der Aggregate um die Differenz.
+
+        Minimum und Maximum können nur erweitert werden; exakt werden sie erst
+        beim Neuaufbau der vollständig gespeicherten Buckets.
+        """
+        deltas = {}
+        for ts, old, new in changed:
+            local = time.localtime(ts)
+            for period, fmt in ROLLUP_PERIODS.items():
+                key = (period, time.strftime(fmt, local))
+                delta = deltas.get(key)
+                if delta is None:
+                    deltas[key] = [new - old, new, new]
+                else:
+                    delta[0] += new - old
+                    delta[1] = min(delta[1], new)
+                    delta[2] = max(delta[2], new)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"UPDATE readings SET {field} = ? WHERE ts = ?", ((new, ts) for ts, _, new in changed)
+                )
+                self._conn.executemany(
+                    "UPDATE rollups SET sum = sum + ?, min = MIN(min, ?), max = MAX(max, ?)"
+                    " WHERE period = ? AND bucket = ? AND metric = ?",
+                    [tuple(delta) + key + (field,) for key, delta in deltas.items()],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _rebuild_retained_rollups(self, field):
+        # Nur Buckets, die nach dem Bucket des ältesten gespeicherten Rahmens beginnen, sind
+        # vollständig in `readings` enthalten. Stunden werden aus den Rahmen, Tage aus den
+        # Stunden und Monate aus den Tagen aufgebaut, jeder Bucket in einer eigenen Transaktion.
+        with self._lock:
+            first = self._conn.execute("SELECT MIN(ts) FROM readings").fetchone()[0]
+        if first is None:
+            return
+        local = time.localtime(first)
+        hour_fmt = ROLLUP_PERIODS["hour"]
+        sources = {
+            # Stufe -> (Abfrage der Werte eines Buckets, Parameter zum Bucket-Schlüssel)
+            "hour": (
+                f"SELECT COUNT({field}), SUM({field}), MIN({field}), MAX({field}) FROM readings"
+                f" WHERE ts >= ? AND ts < ? AND {field} IS NOT NULL"
+                " AND strftime(?, ts, 'unixepoch', 'localtime') = ?",
+                lambda bucket: self._hour_range(bucket) + (hour_fmt, bucket),
+            ),
+            "day": (
+                "SELECT SUM(count), SUM(sum), MIN(min), MAX(max) FROM rollups"
+                " WHERE period = 'hour' AND metric = ? AND bucket BETWEEN ? AND ?",
+                lambda bucket: (field, f"{bucket} 00", f"{bucket} 23"),
+            ),
+            "month": (
+                "SELECT SUM(count), SUM(sum), MIN(min), MAX(max) FROM rollups"
+                " WHERE period = 'day' AND metric = ? AND bucket BETWEEN ? AND ?",
+                lambda bucket: (field, f"{bucket}-01", f"{bucket}-31"),
+            ),
+        }
+        for period, (select, params) in sources.items():
+            with self._lock:
+                buckets = [row[0] for row in self._conn.execute(
+                    "SELECT bucket FROM rollups WHERE period = ? AND metric = ? AND bucket > ?",
+                    (period, field, time.strftime(ROLLUP_PERIODS[period], local)),
+                )]
+            for bucket in buckets:
+                with self._lock:
+                    self._conn.execute("BEGIN")
+                    try:
+                        count, total, minimum, maximum = self._conn.execute(select, params(bucket)).fetchone()
+                        if count:
+                            self._conn.execute(
+                                "UPDATE rollups SET count = ?, sum = ?, min = ?, max = ?"
+                                " WHERE period = ? AND bucket = ? AND metric = ?",
+                                (count, total, minimum, maximum, period, bucket, field),
+                            )
+                        self._conn.execute("COMMIT")
+                    except Exception:
+                        self._conn.execute("ROLLBACK")
+                        raise
+
+    @staticmethod
+    def _hour_range(bucket):
+        # Großzügiger Zeitbereich um die Stunde (Sommerzeitwechsel), genau filtert strftime
+        start = time.mktime(time.strptime(bucket, ROLLUP_PERIODS["hour"]))
+        return (start - 3600, start + 7200)
+
+    def apply_retention(self, now=None):
+        """Löscht Rahmen außerhalb der Aufbewahrungsfrist und gibt Speicherplatz frei.
+
+        Mit Archiv werden die Rahmen vorher blockweise dorthin verschoben.
+        """
+        cutoff = (time.time() if now is None else now) - self.retention_days * 86400
+        with self._lock:
+            if self.archive is not None:
+                self._archive_until(cutoff)
+            deleted = self._conn.execute("DELETE FROM readings WHERE ts < ?", (cutoff,)).rowcount
+            # Stundenaggregate verfallen mit den Rohdaten, Tage und Monate bleiben erhalten
+            hour = time.strftime(ROLLUP_PERIODS["hour"], time.localtime(cutoff))
+            deleted += self._conn.execute(
+                "DELETE FROM rollups WHERE period = 'hour' AND bucket < ?", (hour,)
+            ).rowcount
+            deleted += self._conn.execute(
+                "DELETE FROM energy WHERE period = 'hour' AND bucket < ?", (hour,)
+            ).rowcount
+            if deleted:
+                self._conn.execute("PRAGMA incremental_vacuum")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    def _archive_until(self, cutoff):
+        # Aufrufer hält self._lock. Erst ins Archiv schreiben, dann löschen: nach einem
+        # Absturz dazwischen setzt der nächste Lauf hinter dem letzten Archivblock fort.
+        last = max(
+            (archive.t_max for archive in self._old_archives + [self.archive] if archive.t_max is not None),
+            default=None,
+        )
+        while True:
+            rows = self._conn.execute(
+                f"SELECT ts, {', '.join(self.columns)} FROM readings"
+                " WHERE ts > ? AND ts < ? ORDER BY ts LIMIT ?",
+                (float("-inf") if last is None else last, cutoff, ARCHIVE_BLOCK_ROWS),
+            ).fetchall()
+            if not rows:
+                return
+            self.archive.append(rows)
+            last = rows[-1][0]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()